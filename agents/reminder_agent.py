@@ -20,6 +20,8 @@ class ReminderAgent:
         # We keep timers mainly so they stay referenced and don't get GC'ed.
         # Each entry is a dict: {"timer": threading.Timer, "reminder_id": str | None}
         self.timers: list[Dict[str, Any]] = []
+        # Resolved lazily on first DB op, then reused (None until Mongo is reachable).
+        self._db = None
 
     # --------- Time parsing helpers ---------
 
@@ -29,8 +31,9 @@ class ReminderAgent:
 
         Priority:
         1. Explicit "in/after/for X {seconds/minutes/hours/days}" → relative from now
-        2. NLU normalized datetime, but ONLY if it's in the future
-        3. Fallback: dateparser over the whole sentence
+        2. NLU normalized datetime; if it's not in the future, fire now
+        3. Fallback: dateparser over the whole sentence (only when NLU gave
+           no datetime or it could not be parsed)
         All in IST.
         """
         text = (cmd.get("original_text") or "").lower().strip()
@@ -56,11 +59,15 @@ class ReminderAgent:
             if unit.startswith("day") or unit == "d":
                 return now + timedelta(days=amount)
 
-        # 2) Use normalized datetime ONLY if it's clearly in the future
+        # 2) Normalized datetime is authoritative: NLU already ran dateparser,
+        #    so a past/now value means "now" rather than a reason to re-parse.
         dt_val = norm.get("datetime")
         if dt_val:
             try:
                 dt = dtparse.isoparse(dt_val)
+            except Exception:
+                dt = None
+            if dt is not None:
                 if dt.tzinfo is None:
                     dt = dt.replace(tzinfo=IST)
                 else:
@@ -68,8 +75,7 @@ class ReminderAgent:
 
                 if dt > now + timedelta(seconds=2):
                     return dt
-            except Exception:
-                pass
+                return now
 
         # 3) Fallback: natural language parse of full text
         try:
@@ -90,12 +96,18 @@ class ReminderAgent:
 
     # --------- MongoDB helpers ---------
 
+    def _col(self):
+        """Return the reminders collection (cached DB handle), or None if unavailable."""
+        if self._db is None:
+            self._db = get_db()
+        return self._db[MONGO_COLLECTION_REMINDERS] if self._db is not None else None
+
     def _save_reminder(
         self, text: str, when_dt: datetime, cmd: Dict[str, Any]
     ) -> Optional[str]:
         """Insert a reminder document into MongoDB. Return reminder_id (string) or None."""
-        db = get_db()
-        if db is None:
+        col = self._col()
+        if col is None:
             return None
         try:
             doc = {
@@ -107,7 +119,7 @@ class ReminderAgent:
                 "source_module": cmd.get("module"),
                 "original_cmd": cmd,
             }
-            res = db[MONGO_COLLECTION_REMINDERS].insert_one(doc)
+            res = col.insert_one(doc)
             return str(res.inserted_id)
         except Exception as e:
             print(f"(reminder) mongo insert error: {e}")
@@ -117,11 +129,11 @@ class ReminderAgent:
         """Mark a reminder as fired in MongoDB."""
         if not reminder_id:
             return
-        db = get_db()
-        if db is None:
+        col = self._col()
+        if col is None:
             return
         try:
-            db[MONGO_COLLECTION_REMINDERS].update_one(
+            col.update_one(
                 {"_id": ObjectId(reminder_id)},
                 {
                     "$set": {
@@ -1,9 +1,19 @@
 # agents/sleep_agent.py
 
+import re
 import subprocess
 
 from utils import which, speak
 
+# Phrase triggers, compiled once so handle() does a single scan per list.
+_ALLOW_RE = re.compile(
+    r"allow sleep|stop preventing sleep|let it sleep|disable keep awake|stop keep awake"
+)
+_KEEP_RE = re.compile(
+    r"don'?t sleep|keep awake|keep running|prevent sleep|caffeinate"
+    r"|stay awake|keep system awake|no sleep"
+)
+
 
 class SleepAgent:
     def __init__(self):
@@ -46,33 +56,10 @@ class SleepAgent:
 
     def handle(self, cmd):
         t = (cmd.get("original_text") or "").lower()
-        if any(
-            p in t
-            for p in [
-                "allow sleep",
-                "stop preventing sleep",
-                "let it sleep",
-                "disable keep awake",
-                "stop keep awake",
-            ]
-        ):
+        if _ALLOW_RE.search(t):
             self.allow_sleep()
             return
-        if any(
-            p in t
-            for p in [
-                "don't sleep",
-                "dont sleep",
-                "keep awake",
-                "keep running",
-                "prevent sleep",
-                "caffeinate",
-                "stay awake",
-                "keep system awake",
-                "no sleep",
-            ]
-        ):
+        if _KEEP_RE.search(t):
             self.keep_awake()
             return
         self.keep_awake()
-
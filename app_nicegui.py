@@ -1,35 +1,45 @@
 # app_nicegui.py
 
+import collections
 import contextlib
+import functools
 import io
+import itertools
 import json
 import queue
-import random
 import sys
 import threading
 import time
 import traceback
+from html import escape
 # Load .env early so gemini_helper and other modules see env vars
-from dotenv import load_dotenv
-from pathlib import Path
-import os
-
-env_path = Path(__file__).resolve().parent / ".env"
-if env_path.exists():
-    load_dotenv(env_path)
-else:
-    # fallback to automatic discovery
-    load_dotenv()
-
-from dataclasses import dataclass
+from bootstrap import load_env
+
+load_env()
+
+from dataclasses import dataclass, field
 from typing import Optional, List
 
 import numpy as np
 import sounddevice as sd
 from nicegui import ui, app
 
+# orjson (C extension) for NLU serialization when installed
+try:
+    import orjson
+
+    def _dumps(obj, pretty: bool = False) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0).decode()
+
+except ImportError:
+    def _dumps(obj, pretty: bool = False) -> str:
+        return json.dumps(obj, indent=2 if pretty else None, ensure_ascii=False)
+
+from config import SETTINGS
 from nlu import process_text_commands
-from utils import log_nlu, iso_now, get_gmail_service, attach_gui_logger
+from audio import TranscriptionWorker, get_input_devices
+from utils import log_nlu, iso_now, get_gmail_service, refresh_gmail_service, attach_gui_logger
+from google.auth.exceptions import RefreshError
 
 # =========================
 # Import core (from main.py)
@@ -49,30 +59,72 @@ except Exception as _e:
     enhance_transcript_async = None
     _GEMINI_FOR_TYPED = False
 
-print(f"(init) GEMINI_FOR_TYPED={_GEMINI_FOR_TYPED}, GEMINI_ENABLED={os.getenv('GEMINI_ENABLED')}")
+print(f"(init) GEMINI_FOR_TYPED={_GEMINI_FOR_TYPED}, GEMINI_ENABLED={SETTINGS.gemini_enabled}")
 
 
 # =========================
 # Thread-safe log collector
 # =========================
+_TS_LAST = (-1, "")  # (epoch second, formatted) — swapped as one tuple
+
+
+def ts_now() -> str:
+    """HH:MM:SS for the current second, formatted at most once per second."""
+    global _TS_LAST
+    sec = int(time.time())
+    last = _TS_LAST
+    if last[0] != sec:
+        last = (sec, time.strftime("%H:%M:%S", time.localtime(sec)))
+        _TS_LAST = last
+    return last[1]
+
+
+def log_line_html(line: str) -> str:
+    """Escape one log line and wrap it as a log-box row (done once, at append time)."""
+    return f"<div>{escape(line)}</div>"
+
+
 class ThreadLog:
+    """Thread-safe list of log lines, stored as ready-to-insert HTML rows."""
+
     def __init__(self):
-        self._q = queue.Queue()
+        self._items: List[str] = []
+        self._lock = threading.Lock()
 
     def put(self, msg: str):
-        ts = time.strftime("%H:%M:%S")
-        self._q.put(f"[{ts}] {msg}")
-
-    def drain(self, max_items: int = 500) -> List[str]:
-        out = []
-        try:
-            while len(out) < max_items:
-                out.append(self._q.get_nowait())
-        except queue.Empty:
-            pass
+        ts = ts_now()
+        row = log_line_html(f"[{ts}] {msg}")
+        with self._lock:
+            self._items.append(row)
+
+    def drain_all(self) -> List[str]:
+        """Return every queued row, swapping in a fresh list under the lock."""
+        with self._lock:
+            self._items, out = [], self._items
         return out
 
 
+class LogLines(collections.deque):
+    """
+    Bounded buffer of UI log rows (pre-escaped HTML; oldest dropped past maxlen).
+    `total` counts every line ever added, so the log box can tell how many
+    lines are new even after old ones fell off the front.
+    """
+
+    def __init__(self, maxlen: int = 500):
+        super().__init__(maxlen=maxlen)
+        self.total = 0
+
+    def append(self, line: str):
+        super().append(line)
+        self.total += 1
+
+    def extend(self, lines):
+        lines = list(lines)
+        super().extend(lines)
+        self.total += len(lines)
+
+
 # =========================
 # Stream redirect (mirror)
 # =========================
@@ -126,6 +178,17 @@ class _StreamToThreadLog(io.TextIOBase):
 # =========================
 # Background listener
 # =========================
+# Which UI sections become stale when a BgState field is assigned
+_DIRTY_SECTIONS = {
+    "mode": ("siri",),
+    "last_text": ("heard",),
+    "last_nlu": ("nlu",),
+    "listening": ("siri", "buttons"),
+    "level": ("siri",),
+    "vad_active": ("siri",),
+}
+
+
 @dataclass
 class BgState:
     mode: str = "idle"  # "idle" | "session"
@@ -135,12 +198,28 @@ class BgState:
     hotword_threshold: int = getattr(core, "HOTWORD_THRESHOLD", 80)
     level: float = 0.0  # 0..1: audio level for Siri animation
     vad_active: bool = False  # whether VAD is currently active
+    # Dirty bits read (and cleared) by the UI timer; everything starts dirty
+    dirty: dict = field(
+        default_factory=lambda: {"siri": True, "heard": True, "nlu": True, "buttons": True}
+    )
+
+    def __setattr__(self, name, value):
+        # Per-frame writes (level, vad_active) mostly repeat the old value;
+        # those must not mark anything dirty.
+        d = self.__dict__
+        if name in d and d[name] == value:
+            return
+        object.__setattr__(self, name, value)
+        dirty = d.get("dirty")
+        if dirty is not None:
+            for section in _DIRTY_SECTIONS.get(name, ()):
+                dirty[section] = True
 
 
 class BackgroundListener:
     """
     Owns audio/VAD/Whisper loop.
-    Runs in a thread; no direct UI calls.
+    Runs in a thread (Whisper + NLU on a TranscriptionWorker); no direct UI calls.
     All prints are mirrored to terminal + ThreadLog.
     """
 
@@ -156,6 +235,7 @@ class BackgroundListener:
         self.planner = core.Planner()
         self.audio_stream = None
         self.vad = None
+        self.asr = None
 
     def _log(self, s: str):
         self.logger.put(s)
@@ -185,6 +265,73 @@ class BackgroundListener:
             self.thread.join(timeout=2.0)
         self.state.listening = False
 
+    def _handle_text(self, text: str):
+        """Session control + NLU + planner for one transcript (Whisper worker thread)."""
+        # Update last heard for UI (voice)
+        self.state.last_text = text
+        self._log(f"[Heard] {text}")
+
+        # Session control
+        if self.state.mode == "idle":
+            cand, score = core.hotword_detect(text)
+            if cand and score >= self.state.hotword_threshold:
+                self._log(f"🟢 Session started with '{cand}'")
+                try:
+                    self.planner.sleep.keep_awake()
+                except Exception:
+                    pass
+                self.state.mode = "session"
+            return
+
+        if self.state.mode == "session":
+            end_cand, end_score = core.endword_detect(text)
+            if end_cand and end_score >= self.state.hotword_threshold:
+                self._log(f"🔴 Session ended with '{end_cand}'")
+                try:
+                    self.planner.sleep.allow_sleep()
+                except Exception:
+                    pass
+                self.state.mode = "idle"
+                return
+
+            # NLU + Planner (may produce multiple commands)
+            cmds = process_text_commands(text)
+            if not cmds:
+                return
+
+            # All subcommands share the utterance timestamp
+            ts = iso_now()
+            for full_cmd in cmds:
+                full_cmd["module"] = "speech_nlu"
+                full_cmd["ts"] = ts
+
+                # update 'last_nlu' for UI
+                self.state.last_nlu = {
+                    "intent": full_cmd.get("intent"),
+                    "normalized": full_cmd.get("normalized"),
+                    "entities": full_cmd.get("entities", []),
+                }
+
+                try:
+                    log_nlu(full_cmd)
+                except Exception as e:
+                    self._log(f"(log) log_nlu error: {e}")
+
+                intent_info = full_cmd.get("intent") or {}
+                label = intent_info.get("label")
+                conf = intent_info.get("confidence")
+                self._log(
+                    f"(nlu) intent={label} conf={conf} "
+                    f"norm={_dumps(full_cmd.get('normalized') or {})}"
+                )
+
+                try:
+                    self.planner.handle(full_cmd)
+                except Exception as e:
+                    self._log(
+                        f"[ERROR] Planner error: {e}\n{traceback.format_exc()}"
+                    )
+
     def _loop(self):
         # Capture all core prints → terminal + web log
         out = _StreamToThreadLog(self.logger, mirror=sys.__stdout__)
@@ -205,6 +352,8 @@ class BackgroundListener:
                     channels=1,
                 )
                 self.vad = core.VADSegmenter(samplerate=self.samplerate)
+                self.asr = TranscriptionWorker(self._handle_text)
+                self.asr.start()
 
                 try:
                     self.audio_stream.start()
@@ -224,6 +373,11 @@ class BackgroundListener:
                 else:
                     self._log("Agent already awake (session active).")
 
+                # Bind hot attributes once; the loop below runs at frame rate.
+                vad = self.vad
+                state = self.state
+                level = state.level
+
                 while not self._stop_flag.is_set():
                     try:
                         f32, pcm = self.audio_stream.read_frame()
@@ -238,84 +392,19 @@ class BackgroundListener:
                     except Exception:
                         rms = 0.0
                     rms = min(max(rms * 4.0, 0.0), 1.0)  # amplify + clamp
-                    self.state.level = 0.85 * self.state.level + 0.15 * rms
+                    level = 0.85 * level + 0.15 * rms
+                    # Smoothed locally; the state only sees 0.01 steps, so
+                    # near-steady input doesn't dirty the Siri section.
+                    state.level = round(level, 2)
 
-                    seg = self.vad.push(pcm, f32)
-                    self.state.vad_active = bool(getattr(self.vad, "active", False))
+                    seg = vad.push(pcm, f32)
+                    state.vad_active = vad.active
 
                     if seg is None:
                         continue
 
-                    utt = seg.astype(np.float32)
-                    text, _, _ = core.transcribe_numpy(utt)
-                    if not text:
-                        continue
-
-                    # Update last heard for UI (voice)
-                    self.state.last_text = text
-                    self._log(f"[Heard] {text}")
-
-                    # Session control
-                    if self.state.mode == "idle":
-                        cand, score = core.hotword_detect(text)
-                        if cand and score >= self.state.hotword_threshold:
-                            self._log(f"🟢 Session started with '{cand}'")
-                            try:
-                                self.planner.sleep.keep_awake()
-                            except Exception:
-                                pass
-                            self.state.mode = "session"
-                        continue
-
-                    if self.state.mode == "session":
-                        end_cand, end_score = core.endword_detect(text)
-                        if end_cand and end_score >= self.state.hotword_threshold:
-                            self._log(f"🔴 Session ended with '{end_cand}'")
-                            try:
-                                self.planner.sleep.allow_sleep()
-                            except Exception:
-                                pass
-                            self.state.mode = "idle"
-                            continue
-
-                        # NLU + Planner (may produce multiple commands)
-                        cmds = process_text_commands(text)
-                        if not cmds:
-                            continue
-
-                        for partial in cmds:
-                            full_cmd = {
-                                "module": "speech_nlu",
-                                "ts": iso_now(),
-                                **partial,
-                            }
-
-                            # update 'last_nlu' for UI
-                            self.state.last_nlu = {
-                                "intent": full_cmd.get("intent"),
-                                "normalized": full_cmd.get("normalized"),
-                                "entities": full_cmd.get("entities", []),
-                            }
-
-                            try:
-                                log_nlu(full_cmd)
-                            except Exception as e:
-                                self._log(f"(log) log_nlu error: {e}")
-
-                            intent_info = full_cmd.get("intent") or {}
-                            label = intent_info.get("label")
-                            conf = intent_info.get("confidence")
-                            self._log(
-                                f"(nlu) intent={label} conf={conf} "
-                                f"norm={json.dumps(full_cmd.get('normalized') or {}, ensure_ascii=False)}"
-                            )
-
-                            try:
-                                self.planner.handle(full_cmd)
-                            except Exception as e:
-                                self._log(
-                                    f"[ERROR] Planner error: {e}\n{traceback.format_exc()}"
-                                )
+                    # Whisper + NLU run on the worker so frames keep flowing
+                    self.asr.submit(seg.astype(np.float32, copy=False))
 
             except Exception as e:
                 self._log(f"[FATAL] Listener crashed: {e}\n{traceback.format_exc()}")
@@ -325,6 +414,8 @@ class BackgroundListener:
                         self.audio_stream.stop()
                 except Exception:
                     pass
+                if self.asr:
+                    self.asr.stop()
                 self.state.listening = False
                 self._log("Audio stopped.")
 
@@ -335,7 +426,7 @@ class BackgroundListener:
 @dataclass
 class AppState:
     logger: ThreadLog
-    log_lines: List[str]
+    log_lines: LogLines
     listener: BackgroundListener
     siri_html: Optional[ui.html] = None
     log_box: Optional[ui.html] = None
@@ -351,12 +442,16 @@ class AppState:
 
     # Caches to avoid redundant UI updates (helps reduce websocket traffic)
     _cache_siri_html: str = ""
-    _cache_log_text: str = ""
+    _log_sent_count: int = 0  # log_lines.total already pushed to the log box
     _cache_last_heard: str = ""
     _cache_last_nlu: str = ""
+    _cache_last_nlu_obj: Optional[dict] = None  # last_nlu object behind _cache_last_nlu
     _cache_email_html: str = ""
 
 
+# Lines kept server-side and in the browser log box
+LOG_MAX_LINES = 500
+
 # create shared logger and listener
 LOGGER = ThreadLog()
 attach_gui_logger(LOGGER)
@@ -368,7 +463,7 @@ LISTENER = BackgroundListener(
 
 STATE = AppState(
     logger=LOGGER,
-    log_lines=[],
+    log_lines=LogLines(maxlen=LOG_MAX_LINES),
     listener=LISTENER,
     mic_device_index=getattr(core, "MIC_DEVICE_INDEX", None),
 )
@@ -425,6 +520,10 @@ def fetch_latest_email_if_needed() -> Optional[dict]:
         STATE.latest_email = {"from": from_h, "subject": subj, "date": date}
         STATE.latest_email_ts = now
         return STATE.latest_email
+    except RefreshError:
+        # Token was revoked/expired for good: rebuild the service next time
+        refresh_gmail_service()
+        return STATE.latest_email
     except Exception:
         # swallow errors, keep old email if any
         return STATE.latest_email
@@ -540,28 +639,83 @@ ui.add_css(
 )
 
 
+# Client-side log appender: each tick only ships the new lines' HTML;
+# setLogLines replaces the box with the full history for a newly connected client
+ui.add_head_html(
+    """
+    <script>
+    function setLogLines(html) {
+        const el = document.getElementById('logbox');
+        if (!el) return;
+        el.innerHTML = html;
+        el.dataset.live = '1';
+        el.scrollTo({ top: el.scrollHeight });
+    }
+    function appendLogLines(html) {
+        const el = document.getElementById('logbox');
+        if (!el) return;
+        if (!el.dataset.live) { el.innerHTML = ''; el.dataset.live = '1'; }
+        el.insertAdjacentHTML('beforeend', html);
+        while (el.childNodes.length > %d) el.removeChild(el.firstChild);
+        el.scrollTo({ top: el.scrollHeight, behavior: 'smooth' });
+    }
+    </script>
+    """ % LOG_MAX_LINES
+)
+
+
+def send_log_history(client) -> None:
+    """
+    Give a (re)connecting browser the lines already pushed to the others;
+    later lines arrive through the regular appendLogLines ticks.
+    """
+    lines = STATE.log_lines
+    n_unsent = min(lines.total - STATE._log_sent_count, len(lines))
+    sent = list(itertools.islice(lines, 0, len(lines) - n_unsent))
+    if not sent:
+        return
+    try:
+        client.run_javascript(f"setLogLines({json.dumps(''.join(sent))});")
+    except Exception:
+        pass
+
+
+app.on_connect(send_log_history)
+
+
 # =========================
 # Siri animation renderer
 # =========================
-def build_siri_html() -> str:
-    is_running = STATE.listener.is_running()
+# The wave phase advances with wall-clock time (8 rad/s) but is
+# quantized into _SIRI_PHASES buckets of |sin|'s period, so the markup stays
+# cacheable while the bars keep moving under a steady level.
+_SIRI_PHASES = 12
+_SIRI_SPEED = 8.0
+
+
+def _siri_phase() -> int:
+    return int(time.monotonic() * _SIRI_SPEED / np.pi * _SIRI_PHASES) % _SIRI_PHASES
+
+
+@functools.lru_cache(maxsize=512)
+def build_siri_html(mode: str, is_running: bool, level: float, vad: bool, phase: int = 0) -> str:
+    """
+    Render the voice bars. Pure in its arguments so identical listener state
+    (level pre-rounded by the caller, phase from _siri_phase()) reuses the
+    cached string object.
+    """
     bars = 32
 
     if not is_running:
         heights = [10 for _ in range(bars)]
         hint = "Press Start, then say “hey agent”."
     else:
-        level = STATE.listener.state.level
-        mode = STATE.listener.state.mode
-        vad = STATE.listener.state.vad_active
-
         base = max(0.02, min(1.0, level))
-        t = time.time() * 8
+        t = phase * np.pi / _SIRI_PHASES
 
         heights = []
         for i in range(bars):
             h = 8 + abs(np.sin((i * 0.4) + t)) * (55 * base)
-            h += random.uniform(-2, 2)
             heights.append(int(max(4, h)))
 
         if mode == "idle":
@@ -569,8 +723,8 @@ def build_siri_html() -> str:
         else:
             hint = "Speak — I’m awake."
 
-    color = "#22c55e" if is_running and STATE.listener.state.mode == "session" and STATE.listener.state.vad_active else "#64748b"
-    glow = "0.9" if is_running and STATE.listener.state.mode == "session" and STATE.listener.state.vad_active else "0.25"
+    color = "#22c55e" if is_running and mode == "session" and vad else "#64748b"
+    glow = "0.9" if is_running and mode == "session" and vad else "0.25"
 
     bars_html = "".join(
         f"<div class='voice-bar' style='height:{h}px;background:{color};box-shadow:0 0 12px rgba(34,197,94,{glow});'></div>"
@@ -586,41 +740,66 @@ def build_siri_html() -> str:
     return html
 
 
+def current_siri_html() -> str:
+    """build_siri_html() for the current listener state."""
+    state = STATE.listener.state
+    return build_siri_html(
+        state.mode,
+        state.listening,
+        round(state.level, 2),
+        state.vad_active,
+        _siri_phase() if state.listening else 0,
+    )
+
+
+# =========================
+# Session card renderer
+# =========================
+_SESSION_TEMPLATE = """
+<div class="card">
+  <div class="metric-label">Backend</div>
+  <div class="metric-value">%s</div>
+  <div class="metric-label" style="margin-top:6px;">Mode</div>
+  <div class="metric-value">%s</div>
+</div>
+"""
+
+
+@functools.lru_cache(maxsize=8)
+def render_session_card(backend: str, mode: str) -> str:
+    # Only a handful of (backend, mode) pairs exist, so all are cached after first use
+    return _SESSION_TEMPLATE % (backend, mode)
+
+
 # =========================
 # Log updater
 # =========================
 def update_logs_and_ui():
     """
     Slower updates: drain logs (every ~1s) and update log box + latest email.
-    We avoid updating UI elements when content has not changed to reduce websocket traffic.
+    We avoid updating UI elements when content has not changed to reduce websocket traffic;
+    the log box only receives the newly appended lines.
     """
     # Drain logs from background thread
-    drained = STATE.logger.drain(200)
+    drained = STATE.logger.drain_all()
     if drained:
         STATE.log_lines.extend(drained)
-        STATE.log_lines = STATE.log_lines[-500:]
-
-    # Update log box (only when changed)
-    if STATE.log_box is not None:
-        text = "\n".join(STATE.log_lines) if STATE.log_lines else "Waiting for events… say 'hey agent' or send a command."
-        if text != STATE._cache_log_text:
-            STATE._cache_log_text = text
 
-            # Re-create the log-box HTML with a stable id so we can scroll it client-side
-            STATE.log_box.content = f"<div id='logbox' class='log-box'>{text}</div>"
-
-            # Run JS in the browser to scroll the log box to the bottom.
-            # Use smooth scrolling for nicer UX.
-            # Wrap in try/except to avoid crashing if JS can't run for some reason.
-            try:
-                ui.run_javascript(
-                    "const el = document.getElementById('logbox');"
-                    "if (el) el.scrollTo({ top: el.scrollHeight, behavior: 'smooth' });"
-                )
-            except Exception:
-                # safe fallback — if JS cannot be executed, ignore
-                pass
+    # Lines appended since the last push (drained + typed-command lines)
+    lines = STATE.log_lines
+    n_new = min(lines.total - STATE._log_sent_count, len(lines))
+    new_lines = list(itertools.islice(lines, len(lines) - n_new, None))
+    STATE._log_sent_count = lines.total
 
+    # Append only the new lines and scroll, in a single websocket message
+    if STATE.log_box is not None and new_lines:
+        append_html = "".join(new_lines)  # rows are pre-escaped HTML
+        # Wrap in try/except to avoid crashing if JS can't run for some reason.
+        try:
+            ui.run_javascript(f"appendLogLines({json.dumps(append_html)});")
+        except Exception:
+            # safe fallback — if JS cannot be executed, ignore
+            pass
 
     # Update latest email (but not too often)
     email = fetch_latest_email_if_needed()
@@ -649,42 +828,60 @@ def update_siri_and_small():
     """
     Faster, lightweight updates (every ~100ms): Siri animation + last heard + last NLU + session card updates.
     Keep these cheap to avoid heavy websocket payloads.
+    Only sections flagged dirty by the listener state are recomputed; flags are
+    cleared before rendering so changes made meanwhile are picked up next tick.
     """
+    state = STATE.listener.state
+    dirty = state.dirty
+    # While listening the wave phase moves with time, so the bars are
+    # re-rendered every tick even when nothing in the state changed.
+    animate = state.listening
+    if not (animate or any(dirty.values())):
+        return
+
     # Update Siri animation (only when different)
-    if STATE.siri_html is not None:
-        new_siri = build_siri_html()
-        if new_siri != STATE._cache_siri_html:
+    if (dirty["siri"] or animate) and STATE.siri_html is not None:
+        dirty["siri"] = False
+        new_siri = current_siri_html()
+        # Cache hits return the same str object, so identity is enough here
+        if new_siri is not STATE._cache_siri_html:
             STATE._cache_siri_html = new_siri
             STATE.siri_html.content = new_siri
 
     # Update last heard (cheap)
-    if STATE.last_heard_box is not None:
+    if dirty["heard"] and STATE.last_heard_box is not None:
+        dirty["heard"] = False
         last_heard = STATE.listener.state.last_text or "—"
         if last_heard != STATE._cache_last_heard:
             STATE._cache_last_heard = last_heard
             STATE.last_heard_box.content = f"<div class='card' style='font-size:0.8rem;'>{last_heard}</div>"
 
     # Update last NLU (cheap)
-    if STATE.last_nlu_box is not None:
+    if dirty["nlu"] and STATE.last_nlu_box is not None:
+        dirty["nlu"] = False
         nlu = STATE.listener.state.last_nlu
-        if nlu:
-            pretty = json.dumps(nlu, indent=2, ensure_ascii=False)
-            nlu_html = f"<div class='card' style='font-size:0.78rem;'><pre>{pretty}</pre></div>"
-        else:
-            nlu_html = "<div class='card' style='font-size:0.8rem;'>Awaiting command…</div>"
-
-        if nlu_html != STATE._cache_last_nlu:
-            STATE._cache_last_nlu = nlu_html
-            STATE.last_nlu_box.content = nlu_html
+        # last_nlu is replaced (never mutated) per command, so the same object
+        # means nothing to serialize
+        if nlu is not STATE._cache_last_nlu_obj:
+            STATE._cache_last_nlu_obj = nlu
+            if nlu:
+                pretty = _dumps(nlu, pretty=True)
+                nlu_html = f"<div class='card' style='font-size:0.78rem;'><pre>{pretty}</pre></div>"
+            else:
+                nlu_html = "<div class='card' style='font-size:0.8rem;'>Awaiting command…</div>"
+
+            if nlu_html != STATE._cache_last_nlu:
+                STATE._cache_last_nlu = nlu_html
+                STATE.last_nlu_box.content = nlu_html
 
     # Update session card + buttons (cheap)
     # We keep this in the faster path so UI feels responsive
     # Find the session_card (closure) by recreating its content function is not necessary;
     # Instead, trigger the same update_session_card logic that was created in build_ui via a small helper.
     # We'll only toggle button enable/disable states here.
-    listening_flag = STATE.listener.is_running()
-    if STATE.start_button is not None and STATE.stop_button is not None:
-        if listening_flag:
+    if dirty["buttons"] and STATE.start_button is not None and STATE.stop_button is not None:
+        dirty["buttons"] = False
+        if STATE.listener.state.listening:
             try:
                 STATE.start_button.disable()
                 STATE.stop_button.enable()
@@ -735,7 +932,7 @@ def build_ui():
                     'flex:3; min-width:0; display:flex; flex-direction:column; gap:12px;'
                 ):
                     # Siri animation
-                    STATE.siri_html = ui.html(build_siri_html(), sanitize=False)
+                    STATE.siri_html = ui.html(current_siri_html(), sanitize=False)
                     ui.space().style('height:4px;')
 
                     # Controls row
@@ -787,32 +984,38 @@ def build_ui():
                         ):
                             ui.html('<div class="section-label">Input</div>', sanitize=False)
 
-                            devices = []
-                            try:
-                                for i, dev in enumerate(sd.query_devices()):
-                                    if dev.get("max_input_channels", 0) > 0:
-                                        devices.append((i, f"{i}: {dev['name']}"))
-                            except Exception as e:
-                                ui.label(f"Device query failed: {e}").style(
+                            # Parallel lists: device index + display label
+                            device_indices: List[int] = []
+                            device_labels: List[str] = []
+                            for i, dev in get_input_devices():
+                                device_indices.append(i)
+                                device_labels.append(f"{i}: {dev['name']}")
+                            if not device_indices:
+                                ui.label("No input devices found.").style(
                                     'font-size:11px; color:#f87171;'
                                 )
 
-                            options = [label for _, label in devices]
-                            index_by_label = {label: idx for idx, label in devices}
-                            if devices:
+                            index_by_label = dict(zip(device_labels, device_indices))
+                            if device_indices:
+                                first_index = device_indices[0]
                                 current = (
                                     STATE.mic_device_index
                                     if STATE.mic_device_index is not None
-                                    else devices[0][0]
+                                    else first_index
                                 )
-                                default_label = next(
-                                    (lbl for idx, lbl in devices if idx == current),
-                                    options[0],
+                                default_label = (
+                                    device_labels[device_indices.index(current)]
+                                    if current in device_indices
+                                    else device_labels[0]
                                 )
 
-                                def on_mic_change(e):
-                                    label = e.value
-                                    idx = index_by_label.get(label, devices[0][0])
+                                # Debounce: apply 0.2 s after the last change, but
+                                # never later than 0.5 s after the first pending one.
+                                mic_pending = {"timer": None, "since": None}
+
+                                def _apply_mic(idx):
+                                    mic_pending["timer"] = None
+                                    mic_pending["since"] = None
                                     STATE.mic_device_index = idx
                                     try:
                                         sd.default.device = (STATE.mic_device_index, None)
@@ -821,8 +1024,22 @@ def build_ui():
                                         pass
                                     STATE.listener.mic_index = STATE.mic_device_index
 
+                                def on_mic_change(e):
+                                    label = e.value
+                                    idx = index_by_label.get(label, first_index)
+                                    now = time.monotonic()
+                                    if mic_pending["timer"] is not None:
+                                        mic_pending["timer"].cancel()
+                                    if mic_pending["since"] is None:
+                                        mic_pending["since"] = now
+                                    delay = min(0.2, max(0.0, mic_pending["since"] + 0.5 - now))
+                                    timer = threading.Timer(delay, _apply_mic, args=(idx,))
+                                    timer.daemon = True
+                                    mic_pending["timer"] = timer
+                                    timer.start()
+
                                 ui.select(
-                                    options=options,
+                                    options=device_labels,
                                     value=default_label,
                                     on_change=on_mic_change,
                                 ).props('dense outlined').style(
@@ -853,121 +1070,125 @@ def build_ui():
                                 if not cmd_txt:
                                     return
 
-                                # --- GEMINI enhancement for typed input (optional, safe) ---
+                                # Collect this submission's log lines and publish them once
+                                events: List[str] = []
+                                ts = ts_now()
                                 try:
-                                    if "_GEMINI_FOR_TYPED" in globals() and _GEMINI_FOR_TYPED and enhance_transcript_sync is not None:
-                                        try:
-                                            enhanced = enhance_transcript_sync(cmd_txt)
-                                            if enhanced and enhanced.strip() != cmd_txt.strip():
-                                                ts_log = time.strftime("%H:%M:%S")
-                                                STATE.log_lines.append(f"[{ts_log}] [Typed] {cmd_txt}")
-                                                STATE.log_lines.append(f"[{ts_log}] [Gemini] {enhanced}")
-                                                cmd_txt = enhanced
-                                        except Exception as e:
-                                            STATE.log_lines.append(f"[{time.strftime('%H:%M:%S')}] (gemini typed) error: {e}")
-                                except Exception:
-                                    # defensive: if globals or names not present, just continue with original text
-                                    pass
+                                    # --- GEMINI enhancement for typed input (optional, safe) ---
+                                    try:
+                                        if "_GEMINI_FOR_TYPED" in globals() and _GEMINI_FOR_TYPED and enhance_transcript_sync is not None:
+                                            try:
+                                                enhanced = enhance_transcript_sync(cmd_txt)
+                                                if enhanced and enhanced.strip() != cmd_txt.strip():
+                                                    events.append(f"[{ts}] [Typed] {cmd_txt}")
+                                                    events.append(f"[{ts}] [Gemini] {enhanced}")
+                                                    cmd_txt = enhanced
+                                            except Exception as e:
+                                                events.append(f"[{ts}] (gemini typed) error: {e}")
+                                    except Exception:
+                                        # defensive: if globals or names not present, just continue with original text
+                                        pass
 
-                                ts = time.strftime("%H:%M:%S")
-                                STATE.log_lines.append(f"[{ts}] [Heard] {cmd_txt}")
+                                    events.append(f"[{ts}] [Heard] {cmd_txt}")
 
-                                # --- Same session logic as voice path ---
-                                if STATE.listener.state.mode == "idle":
-                                    cand, score = core.hotword_detect(cmd_txt)
-                                    thr = STATE.listener.state.hotword_threshold
-                                    if cand and score >= thr:
-                                        STATE.log_lines.append(
-                                            f"[{ts}] 🟢 Session started with '{cand}'"
-                                        )
-                                        try:
-                                            STATE.listener.planner.sleep.keep_awake()
-                                        except Exception:
-                                            pass
-                                        STATE.listener.state.mode = "session"
-                                    else:
-                                        STATE.log_lines.append(
-                                            f"[{ts}] (idle) No hotword detected."
-                                        )
-                                    # In idle, we only use this to wake the agent.
-                                    # No commands are executed in this turn.
-                                    return
-
-                                else:
-                                    # In an active session: check for end word first
-                                    end_cand, end_score = core.endword_detect(cmd_txt)
-                                    if (
-                                        end_cand
-                                        and end_score >= STATE.listener.state.hotword_threshold
-                                    ):
-                                        STATE.log_lines.append(
-                                            f"[{ts}] 🔴 Session ended with '{end_cand}'"
-                                        )
-                                        try:
-                                            STATE.listener.planner.sleep.allow_sleep()
-                                        except Exception:
-                                            pass
-                                        STATE.listener.state.mode = "idle"
+                                    # --- Same session logic as voice path ---
+                                    if STATE.listener.state.mode == "idle":
+                                        cand, score = core.hotword_detect(cmd_txt)
+                                        thr = STATE.listener.state.hotword_threshold
+                                        if cand and score >= thr:
+                                            events.append(
+                                                f"[{ts}] 🟢 Session started with '{cand}'"
+                                            )
+                                            try:
+                                                STATE.listener.planner.sleep.keep_awake()
+                                            except Exception:
+                                                pass
+                                            STATE.listener.state.mode = "session"
+                                        else:
+                                            events.append(
+                                                f"[{ts}] (idle) No hotword detected."
+                                            )
+                                        # In idle, we only use this to wake the agent.
+                                        # No commands are executed in this turn.
                                         return
 
-                                # --- If we reach here, we’re in session and should handle the command ---
-                                cmds = process_text_commands(cmd_txt)
-                                if not cmds:
-                                    return
-
-                                for partial in cmds:
-                                    full_cmd = {
-                                        "module": "typed_nlu",
-                                        "ts": iso_now(),
-                                        **partial,
-                                    }
-
-                                    try:
-                                        log_nlu(full_cmd)
-                                    except Exception as e:
-                                        STATE.log_lines.append(
-                                            f"[{ts}] (log) log_nlu error: {e}"
-                                        )
+                                    else:
+                                        # In an active session: check for end word first
+                                        end_cand, end_score = core.endword_detect(cmd_txt)
+                                        if (
+                                            end_cand
+                                            and end_score >= STATE.listener.state.hotword_threshold
+                                        ):
+                                            events.append(
+                                                f"[{ts}] 🔴 Session ended with '{end_cand}'"
+                                            )
+                                            try:
+                                                STATE.listener.planner.sleep.allow_sleep()
+                                            except Exception:
+                                                pass
+                                            STATE.listener.state.mode = "idle"
+                                            return
+
+                                    # --- If we reach here, we’re in session and should handle the command ---
+                                    cmds = process_text_commands(cmd_txt)
+                                    if not cmds:
+                                        return
 
-                                    intent_info = full_cmd.get("intent") or {}
-                                    label = intent_info.get("label")
-                                    conf = intent_info.get("confidence")
-
-                                    STATE.log_lines.append(
-                                        f"[{ts}] (nlu) intent={label} conf={conf} "
-                                        f"norm={json.dumps(full_cmd.get('normalized') or {}, ensure_ascii=False)}"
-                                    )
-
-                                    # update "last NLU" box from typed path
-                                    STATE.listener.state.last_nlu = {
-                                        "intent": full_cmd.get("intent"),
-                                        "normalized": full_cmd.get("normalized"),
-                                        "entities": full_cmd.get("entities", []),
-                                    }
-
-                                    # --- Run planner in background thread so UI doesn't block ---
-                                    def worker(cmd_local, ts_local):
-                                        out = _StreamToThreadLog(
-                                            STATE.logger, mirror=sys.__stdout__
-                                        )
-                                        err = _StreamToThreadLog(
-                                            STATE.logger,
-                                            prefix="[stderr] ",
-                                            mirror=sys.__stderr__,
+                                    for partial in cmds:
+                                        full_cmd = {
+                                            "module": "typed_nlu",
+                                            "ts": iso_now(),
+                                            **partial,
+                                        }
+
+                                        intent_info = full_cmd.get("intent") or {}
+                                        label = intent_info.get("label")
+                                        conf = intent_info.get("confidence")
+
+                                        # One log entry per command (NLU line + any log error)
+                                        entry = (
+                                            f"[{ts}] (nlu) intent={label} conf={conf} "
+                                            f"norm={_dumps(full_cmd.get('normalized') or {})}"
                                         )
                                         try:
-                                            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
-                                                STATE.listener.planner.handle(cmd_local)
+                                            log_nlu(full_cmd)
                                         except Exception as e:
-                                            STATE.logger.put(
-                                                f"[{ts_local}] [ERROR] Planner error: {e}\n{traceback.format_exc()}"
+                                            entry += f"\n[{ts}] (log) log_nlu error: {e}"
+                                        events.append(entry)
+
+                                        # update "last NLU" box from typed path
+                                        STATE.listener.state.last_nlu = {
+                                            "intent": full_cmd.get("intent"),
+                                            "normalized": full_cmd.get("normalized"),
+                                            "entities": full_cmd.get("entities", []),
+                                        }
+
+                                        # --- Run planner in background thread so UI doesn't block ---
+                                        def worker(cmd_local, ts_local):
+                                            out = _StreamToThreadLog(
+                                                STATE.logger, mirror=sys.__stdout__
                                             )
-
-                                    threading.Thread(
-                                        target=worker,
-                                        args=(full_cmd, ts),
-                                        daemon=True,
-                                    ).start()
+                                            err = _StreamToThreadLog(
+                                                STATE.logger,
+                                                prefix="[stderr] ",
+                                                mirror=sys.__stderr__,
+                                            )
+                                            try:
+                                                with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                                                    STATE.listener.planner.handle(cmd_local)
+                                            except Exception as e:
+                                                STATE.logger.put(
+                                                    f"[{ts_local}] [ERROR] Planner error: {e}\n{traceback.format_exc()}"
+                                                )
+
+                                        threading.Thread(
+                                            target=worker,
+                                            args=(full_cmd, ts),
+                                            daemon=True,
+                                        ).start()
+                                finally:
+                                    if events:
+                                        STATE.log_lines.extend(map(log_line_html, events))
 
 
                             # Pressing Enter triggers on_send()
@@ -996,16 +1217,9 @@ def build_ui():
 
                     def session_card_html() -> str:
                         mode = STATE.listener.state.mode
-                        listening_flag = STATE.listener.is_running()
+                        listening_flag = STATE.listener.state.listening
                         backend = 'Listening' if listening_flag else 'Stopped'
-                        return f"""
-                        <div class="card">
-                          <div class="metric-label">Backend</div>
-                          <div class="metric-value">{backend}</div>
-                          <div class="metric-label" style="margin-top:6px;">Mode</div>
-                          <div class="metric-value">{mode}</div>
-                        </div>
-                        """
+                        return render_session_card(backend, mode)
 
                     session_card = ui.html(session_card_html(), sanitize=False)
 
@@ -1045,30 +1259,39 @@ def build_ui():
                         sanitize=False,
                     )
 
-                    # Timer: keep session card + buttons in sync with backend
+                    # Timer: keep session card in sync with backend. Re-render only
+                    # when (mode, listening) changes; buttons follow the "buttons"
+                    # dirty bit in update_siri_and_small.
+                    session_prev = {"key": None}
+
                     def update_session_card():
-                        listening_flag = STATE.listener.is_running()
+                        key = (STATE.listener.state.mode, STATE.listener.state.listening)
+                        if key == session_prev["key"]:
+                            return
+                        session_prev["key"] = key
                         session_card.content = session_card_html()
 
-                        if STATE.start_button is not None and STATE.stop_button is not None:
-                            if listening_flag:
-                                STATE.start_button.disable()
-                                STATE.stop_button.enable()
-                            else:
-                                STATE.start_button.enable()
-                                STATE.stop_button.disable()
-
                     ui.timer(0.3, callback=update_session_card)
 
 
 # =========================
-# Global timers for logs + animation + email
+# Global timer for logs + animation + email
 # =========================
-# IMPORTANT: Use two timers to avoid flooding websocket with frequent large updates.
-# - update_siri_and_small: ~100ms for animation + small UI pieces (low payload)
-# - update_logs_and_ui: ~1s for logs and email (higher payload, less frequent)
-ui.timer(0.1, callback=update_siri_and_small)
-ui.timer(1.0, callback=update_logs_and_ui)
+# One 100ms tick so both update paths land in the same websocket flush:
+# - update_siri_and_small: every tick, for animation + small UI pieces (low payload)
+# - update_logs_and_ui: every 10th tick (~1s), for logs and email
+_tick_count = 0
+
+
+def tick():
+    global _tick_count
+    _tick_count += 1
+    update_siri_and_small()
+    if _tick_count % 10 == 0:
+        update_logs_and_ui()
+
+
+ui.timer(0.1, callback=tick)
 
 
 # =========================
@@ -1,37 +1,61 @@
 # audio.py
 
 import queue
-from typing import Optional, Tuple
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
 
 import numpy as np
 import sounddevice as sd
 import webrtcvad
-import whisper
+
+# Prefer the CTranslate2 backend (int8 weights); fall back to openai-whisper
+try:
+    from faster_whisper import WhisperModel
+except Exception:
+    WhisperModel = None
+    import whisper
 
 from config import (
     SAMPLE_RATE,
     FRAME_MS,
     FRAME_LEN,
+    AUDIO_RING_FRAMES,
     VAD_AGGRESSIVENESS,
     SILENCE_HANGOVER_MS,
     MAX_UTTERANCE_SEC,
     MIN_UTTERANCE_SEC,
     WHISPER_MODEL_SIZE,
+    WHISPER_COMPUTE_TYPE,
 )
 from utils import speak
 
 # --------- Microphone selection ---------
 
 
+_DEVICES_CACHE: Optional[List[Tuple[int, dict]]] = None
+
+
+def get_input_devices() -> List[Tuple[int, dict]]:
+    """(index, device info) for every input-capable device; queried once per process."""
+    global _DEVICES_CACHE
+    if _DEVICES_CACHE is None:
+        try:
+            _DEVICES_CACHE = [
+                (i, dev)
+                for i, dev in enumerate(sd.query_devices())
+                if dev.get("max_input_channels", 0) > 0
+            ]
+        except Exception as e:
+            print(f"⚠️ Could not query audio devices: {e}")
+            _DEVICES_CACHE = []
+    return _DEVICES_CACHE
+
+
 def get_default_mic() -> Optional[int]:
-    try:
-        devices = sd.query_devices()
-        for i, dev in enumerate(devices):
-            if dev.get("max_input_channels", 0) > 0:
-                print(f"🎤 Using mic device: {i} → {dev['name']}")
-                return i
-    except Exception as e:
-        print(f"⚠️ Could not query audio devices: {e}")
+    for i, dev in get_input_devices():
+        print(f"🎤 Using mic device: {i} → {dev['name']}")
+        return i
     print("⚠️ No microphone found, using default")
     return None
 
@@ -40,26 +64,89 @@ MIC_DEVICE_INDEX = get_default_mic()
 
 # --------- Audio streaming ---------
 
+# Fused clip + scale + cast of one float32 frame into an int16 buffer.
+# Numba compiles it to a single loop; otherwise two in-place ufuncs.
+def _clip_scale_np(src, dst, scratch):
+    np.clip(src, -1, 1, out=scratch)
+    np.multiply(scratch, 32767, out=dst, casting="unsafe")
+
+
+_clip_scale = _clip_scale_np
+
+try:
+    import numba
+except Exception:
+    numba = None
+
+if numba is not None:
+    try:
+        @numba.njit(cache=True, fastmath=True)
+        def _clip_scale_jit(src, dst, scratch):
+            for i in range(src.size):
+                v = src[i]
+                if v > 1.0:
+                    v = 1.0
+                elif v < -1.0:
+                    v = -1.0
+                dst[i] = np.int16(v * 32767.0)
+
+        # Compile now, with the dtypes/layout of a ring slot, so the first
+        # PortAudio callback doesn't stall on JIT (or fail on typing).
+        _clip_scale_jit(
+            np.zeros(FRAME_LEN, dtype=np.float32),
+            np.empty(FRAME_LEN, dtype=np.int16),
+            np.empty(FRAME_LEN, dtype=np.float32),
+        )
+        _clip_scale = _clip_scale_jit
+    except Exception as e:
+        print(f"⚠️ numba clip kernel unavailable, using numpy: {e}")
+
 
 class AudioStream:
+    """
+    Mic capture. Frames travel from the PortAudio callback (single producer)
+    to read_frame() (single consumer) through a preallocated ring buffer:
+    the producer only advances `_head`, the consumer only advances `_tail`,
+    so no lock is taken on the 50 Hz audio path.
+    """
+
     def __init__(self, samplerate=SAMPLE_RATE, device=MIC_DEVICE_INDEX, channels=1):
         self.samplerate = samplerate
         self.device = device
         self.channels = channels
-        self.q: "queue.Queue[np.ndarray]" = queue.Queue()
         self.stream = None
+        # One FRAME_LEN row per slot: mono float32 + its PCM16 rendering
+        self._ring_f32 = np.empty((AUDIO_RING_FRAMES, FRAME_LEN), dtype=np.float32)
+        self._ring_i16 = np.empty((AUDIO_RING_FRAMES, FRAME_LEN), dtype=np.int16)
+        self._clip_buf = np.empty(FRAME_LEN, dtype=np.float32)
+        self._head = 0  # frames written (producer only)
+        self._tail = 0  # frames read (consumer only)
+        self._callback_error = False
 
     def _callback(self, indata, frames, t, status):
         try:
-            if indata is None:
+            # blocksize=FRAME_LEN, so every block fits one slot exactly
+            if indata is None or frames != FRAME_LEN:
                 return
+            head = self._head
+            if head - self._tail >= AUDIO_RING_FRAMES:
+                return  # consumer fell a full ring behind: drop this frame
+            slot = head % AUDIO_RING_FRAMES
+            f32 = self._ring_f32[slot]
+            # Downmix to mono straight into the ring slot
             if getattr(indata, "ndim", 1) > 1 and indata.shape[1] > 1:
-                mono = np.mean(indata, axis=1)
+                np.mean(indata, axis=1, out=f32)
             else:
-                mono = indata[:, 0] if getattr(indata, "ndim", 1) > 1 else indata
-            self.q.put(np.asarray(mono, dtype=np.float32).copy())
-        except Exception:
-            pass
+                np.copyto(f32, indata[:, 0] if getattr(indata, "ndim", 1) > 1 else indata)
+            # PCM16 for the VAD: clip + scale + cast without temporaries
+            _clip_scale(f32, self._ring_i16[slot], self._clip_buf)
+            # Publish only after the slot is fully written
+            self._head = head + 1
+        except Exception as e:
+            # Report once: this runs at frame rate on the real-time thread
+            if not self._callback_error:
+                self._callback_error = True
+                print(f"⚠️ Audio callback error (frames dropped): {e!r}")
 
     def start(self):
         self.stream = sd.InputStream(
@@ -73,8 +160,18 @@ class AudioStream:
         self.stream.start()
 
     def read_frame(self) -> Tuple[np.ndarray, bytes]:
-        data = self.q.get(timeout=1)
-        pcm16 = (np.clip(data, -1, 1) * 32767).astype(np.int16).tobytes()
+        """Next (float32 frame, pcm16 bytes); raises queue.Empty after 1 s of silence."""
+        tail = self._tail
+        deadline = time.monotonic() + 1.0
+        while self._head == tail:
+            if time.monotonic() >= deadline:
+                raise queue.Empty
+            time.sleep(FRAME_MS / 4000)
+        slot = tail % AUDIO_RING_FRAMES
+        # Copy out before releasing the slot back to the producer
+        data = self._ring_f32[slot].copy()
+        pcm16 = self._ring_i16[slot].tobytes()
+        self._tail = tail + 1
         return data, pcm16
 
     def stop(self):
@@ -99,14 +196,32 @@ class VADSegmenter:
         self.samplerate = samplerate
         self.frame_len = frame_len
         self.hangover_frames = int(hangover_ms / FRAME_MS)
+        # Utterance buffers sized once for the longest utterance (+1 frame);
+        # reset() only rewinds the fill counters.
+        cap = int(MAX_UTTERANCE_SEC * samplerate) + frame_len
+        self.buffer_f32 = np.empty(cap, dtype=np.float32)
+        self.buffer_pcm = bytearray(cap * 2)
         self.reset()
 
     def reset(self):
-        self.buffer_pcm = bytearray()
-        self.buffer_f32 = []
+        self.n = 0  # samples held in buffer_f32
+        self.pcm_n = 0  # bytes held in buffer_pcm
         self.active = False
         self.silence_count = 0
 
+    def _append(self, pcm_bytes: bytes, f32_frame: np.ndarray):
+        n, k = self.n, len(f32_frame)
+        if n + k > len(self.buffer_f32):
+            self.buffer_f32 = np.resize(self.buffer_f32, n + k)
+        self.buffer_f32[n:n + k] = f32_frame
+        self.n = n + k
+
+        p, m = self.pcm_n, len(pcm_bytes)
+        if p + m > len(self.buffer_pcm):
+            self.buffer_pcm.extend(bytes(p + m - len(self.buffer_pcm)))
+        self.buffer_pcm[p:p + m] = pcm_bytes
+        self.pcm_n = p + m
+
     def push(self, pcm_bytes: bytes, f32_frame: np.ndarray):
         try:
             is_speech = self.vad.is_speech(pcm_bytes, self.samplerate)
@@ -114,21 +229,19 @@ class VADSegmenter:
             is_speech = False
 
         if is_speech:
-            self.buffer_pcm.extend(pcm_bytes)
-            self.buffer_f32.append(f32_frame)
+            self._append(pcm_bytes, f32_frame)
             self.silence_count = 0
             self.active = True
         else:
             if self.active:
                 self.silence_count += 1
-                self.buffer_pcm.extend(pcm_bytes)
-                self.buffer_f32.append(f32_frame)
+                self._append(pcm_bytes, f32_frame)
 
         out = None
         if self.active:
-            dur = sum(len(f) for f in self.buffer_f32) / self.samplerate
+            dur = self.n / self.samplerate
             if (self.silence_count >= self.hangover_frames and dur >= MIN_UTTERANCE_SEC) or dur >= MAX_UTTERANCE_SEC:
-                out = np.concatenate(self.buffer_f32) if self.buffer_f32 else np.array([], dtype=np.float32)
+                out = self.buffer_f32[:self.n].copy()
                 self.reset()
         return out
 
@@ -137,7 +250,12 @@ class VADSegmenter:
 
 print("Loading Whisper + NLP models…")
 try:
-    _whisper_model = whisper.load_model(WHISPER_MODEL_SIZE)
+    if WhisperModel is not None:
+        _whisper_model = WhisperModel(
+            WHISPER_MODEL_SIZE, device="cpu", compute_type=WHISPER_COMPUTE_TYPE
+        )
+    else:
+        _whisper_model = whisper.load_model(WHISPER_MODEL_SIZE)
 except Exception as e:
     print(f"(whisper) model load error: {e}")
     _whisper_model = None
@@ -150,6 +268,17 @@ def transcribe_numpy(audio_f32: np.ndarray):
     if _whisper_model is None:
         return "", "en", {}
     try:
+        if WhisperModel is not None:
+            segments, info = _whisper_model.transcribe(
+                audio_f32,
+                task="transcribe",
+                language="en",
+                beam_size=1,
+            )
+            text = " ".join(s.text.strip() for s in segments).strip()
+            lang = info.language or "en"
+            return text, lang, {"text": text, "language": lang}
+
         result = _whisper_model.transcribe(
             audio_f32,
             fp16=False,
@@ -161,3 +290,56 @@ def transcribe_numpy(audio_f32: np.ndarray):
         print(f"(whisper) error: {e}")
         return "", "en", {}
 
+
+class TranscriptionWorker:
+    """
+    Runs Whisper on a background thread so the frame reader never blocks.
+    Segments are handed over with submit(); non-empty transcripts are passed
+    to `callback(text)` on the worker thread. When `maxsize` segments are
+    already waiting, new ones are dropped (backpressure).
+    """
+
+    def __init__(self, callback: Callable[[str], None], maxsize: int = 4):
+        self.callback = callback
+        self.q: "queue.Queue[np.ndarray]" = queue.Queue(maxsize=maxsize)
+        self.thread: Optional[threading.Thread] = None
+        self._stop_flag = threading.Event()
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop_flag.clear()
+        self.thread = threading.Thread(
+            target=self._run,
+            name="whisper_worker",
+            daemon=True,
+        )
+        self.thread.start()
+
+    def submit(self, audio_f32: np.ndarray) -> bool:
+        """Queue a segment for transcription; return False if it was dropped."""
+        try:
+            self.q.put_nowait(audio_f32)
+            return True
+        except queue.Full:
+            print("(whisper) busy, dropping utterance")
+            return False
+
+    def stop(self, timeout: float = 2.0):
+        self._stop_flag.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+
+    def _run(self):
+        while not self._stop_flag.is_set():
+            try:
+                audio_f32 = self.q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            text, _, _ = transcribe_numpy(audio_f32)
+            if not text:
+                continue
+            try:
+                self.callback(text)
+            except Exception as e:
+                print(f"(whisper) transcript handler error: {e}")
@@ -0,0 +1,51 @@
+# bootstrap.py
+
+import threading
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ENV_PATH = Path(__file__).resolve().parent / ".env"
+COMPILED_PATH = ENV_PATH.with_name("_env_compiled.py")  # see tools/build_env.py
+
+_LOADED = False
+_LOAD_LOCK = threading.Lock()
+
+
+def _load_compiled() -> bool:
+    """Import _env_compiled if it exists and is not older than .env."""
+    try:
+        compiled_mtime = COMPILED_PATH.stat().st_mtime
+    except OSError:
+        return False
+    try:
+        if ENV_PATH.stat().st_mtime > compiled_mtime:
+            return False  # stale: .env edited since the last build
+    except OSError:
+        return False  # .env removed: don't keep serving its old values
+    try:
+        import _env_compiled
+    except Exception:
+        return False
+    return True
+
+
+def load_env() -> None:
+    """Load .env into os.environ once per process; later calls are no-ops."""
+    global _LOADED
+    if _LOADED:
+        return
+    with _LOAD_LOCK:
+        if _LOADED:
+            return
+        if _load_compiled():
+            print(f"(env) loaded {COMPILED_PATH.name}")
+        elif ENV_PATH.exists():
+            load_dotenv(ENV_PATH)
+            print(f"(env) loaded {ENV_PATH}")
+        # fallback to automatic discovery
+        elif load_dotenv():
+            print("(env) loaded .env found by dotenv search")
+        else:
+            print("(env) no .env found; using the process environment")
+        _LOADED = True
@@ -1,15 +1,17 @@
 # config.py
 
+import logging
 import os
 import warnings
+from dataclasses import dataclass
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
 from datetime import timezone, timedelta
 
-from dotenv import load_dotenv
+from bootstrap import load_env
 
-load_dotenv()
+load_env()  # no-op when an entry point already loaded .env
 
 # ---- Timezone ----
 IST = ZoneInfo("Asia/Kolkata")
@@ -22,6 +24,7 @@ SAMPLE_RATE = 16000
 MIC_DEVICE_INDEX = None
 FRAME_MS = 20
 FRAME_LEN = int(SAMPLE_RATE * FRAME_MS / 1000)
+AUDIO_RING_FRAMES = 256  # capture ring capacity (~5 s at 20 ms frames)
 
 VAD_AGGRESSIVENESS = 2
 MAX_UTTERANCE_SEC = 20
@@ -29,6 +32,8 @@ MIN_UTTERANCE_SEC = 0.8
 SILENCE_HANGOVER_MS = 600
 
 WHISPER_MODEL_SIZE = "tiny.en"
+# faster-whisper only: "int8" on CPU, "int8_float16" on GPU
+WHISPER_COMPUTE_TYPE = "int8"
 
 # ---- Logs ----
 NLU_LOG = Path("nlu_log.jsonl")
@@ -39,14 +44,68 @@ NLU_LOG.touch(exist_ok=True)
 AGENT_LOG.parent.mkdir(parents=True, exist_ok=True)
 AGENT_LOG.touch(exist_ok=True)
 
+# ---- Environment-backed settings (read once at import) ----
+def _log_level_from_env() -> str:
+    """LOG_LEVEL as a logging level name; unknown values fall back to INFO."""
+    raw = os.getenv("LOG_LEVEL", "INFO")
+    name = raw.strip().upper()
+    if isinstance(logging.getLevelName(name), int):
+        return name
+    warnings.warn(f"Unknown LOG_LEVEL {raw!r}; using INFO")
+    return "INFO"
+
+
+@dataclass(frozen=True)
+class Settings:
+    mongo_uri: str
+    mongo_db_name: str
+    mongo_collection_nlu: str
+    mongo_collection_agent: str
+    mongo_collection_reminders: str
+    gemini_enabled: bool
+    gemini_wait_timeout: float
+    gemini_api_key: str | None
+    gemini_model: str
+    gemini_max_concurrent: int
+    gemini_cache_ttl: int
+    gemini_call_timeout: float
+    gemini_min_tokens: int
+    gemini_breaker_failures: int
+    gemini_breaker_cooldown: float
+    log_level: str
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            mongo_uri=os.getenv("MONGO_URI", ""),
+            mongo_db_name=os.getenv("MONGO_DB_NAME", "agentic_os"),
+            mongo_collection_nlu=os.getenv("MONGO_COLLECTION_NLU", "nlu_log"),
+            mongo_collection_agent=os.getenv("MONGO_COLLECTION_AGENT", "agent_log"),
+            mongo_collection_reminders=os.getenv("MONGO_COLLECTION_REMINDERS", "reminders"),
+            gemini_enabled=os.getenv("GEMINI_ENABLED", "true").lower() in ("1", "true", "yes"),
+            gemini_wait_timeout=float(os.getenv("GEMINI_WAIT_TIMEOUT", "2.0")),
+            gemini_api_key=os.getenv("GEMINI_API_KEY", None),
+            gemini_model=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"),
+            gemini_max_concurrent=int(os.getenv("GEMINI_MAX_CONCURRENT", "3")),
+            gemini_cache_ttl=int(os.getenv("GEMINI_CACHE_TTL", "300")),
+            gemini_call_timeout=float(os.getenv("GEMINI_CALL_TIMEOUT", "5.0")),
+            gemini_min_tokens=int(os.getenv("GEMINI_MIN_TOKENS", "3")),
+            gemini_breaker_failures=int(os.getenv("GEMINI_BREAKER_FAILURES", "3")),
+            gemini_breaker_cooldown=float(os.getenv("GEMINI_BREAKER_COOLDOWN", "60")),
+            log_level=_log_level_from_env(),
+        )
+
+
+SETTINGS = Settings.from_env()
+
 # --- MongoDB configuration (for logs etc.) ---
 
-MONGO_URI = os.getenv("MONGO_URI", "")
-MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "agentic_os")
+MONGO_URI = SETTINGS.mongo_uri
+MONGO_DB_NAME = SETTINGS.mongo_db_name
 
-MONGO_COLLECTION_NLU = os.getenv("MONGO_COLLECTION_NLU", "nlu_log")
-MONGO_COLLECTION_AGENT = os.getenv("MONGO_COLLECTION_AGENT", "agent_log")
-MONGO_COLLECTION_REMINDERS = os.getenv("MONGO_COLLECTION_REMINDERS", "reminders")
+MONGO_COLLECTION_NLU = SETTINGS.mongo_collection_nlu
+MONGO_COLLECTION_AGENT = SETTINGS.mongo_collection_agent
+MONGO_COLLECTION_REMINDERS = SETTINGS.mongo_collection_reminders
 
 
 # ---- Hotwords ----
@@ -1,33 +1,47 @@
 # db.py
 
-from functools import lru_cache
+import threading
 
 from pymongo import MongoClient
 
 from config import MONGO_URI, MONGO_DB_NAME
 
+# Lazily created once (double-checked locking); None if not configured/failed.
+_client: MongoClient | None = None
+_client_ready = False
+_client_lock = threading.Lock()
+_db = None  # cached client[MONGO_DB_NAME]
+
 
-@lru_cache(maxsize=1)
 def _get_client() -> MongoClient | None:
     """Create and cache a MongoDB client (or return None if not configured)."""
-    if not MONGO_URI:
-        return None
-    try:
-        client = MongoClient(MONGO_URI)
-        return client
-    except Exception as e:
-        print(f"(db) Failed to create Mongo client: {e}")
-        return None
+    global _client, _client_ready
+    if _client_ready:
+        return _client
+    with _client_lock:
+        if _client_ready:
+            return _client
+        if MONGO_URI:
+            try:
+                _client = MongoClient(MONGO_URI)
+            except Exception as e:
+                print(f"(db) Failed to create Mongo client: {e}")
+                _client = None
+        _client_ready = True
+        return _client
 
 
 def get_db():
     """Return the configured database object, or None if unavailable."""
+    global _db
+    if _db is not None:
+        return _db
     client = _get_client()
     if client is None or not MONGO_DB_NAME:
         return None
     try:
-        return client[MONGO_DB_NAME]
+        _db = client[MONGO_DB_NAME]
     except Exception as e:
         print(f"(db) Failed to get DB: {e}")
         return None
-
+    return _db
@@ -3,16 +3,15 @@
 Gemini post-processing helper for ASR transcripts.
 
 Provides:
-- apply_simple_corrections (token-aware)
-- _local_fuzzy_fix (token-level fuzzy replacements)
-- enhance_transcript_sync / enhance_transcript_async
+- clean_transcript (direct + fuzzy token corrections in one pass)
+- enhance_transcript_sync / enhance_transcript_async / is_enhancement_settled
 - rerank_candidates_sync
 - refine_intent_sync
 
 Safe: works without google.generativeai installed (falls back to local rules).
 """
 
-import os
+import functools
 import re
 import time
 import json
@@ -20,6 +19,8 @@ import threading
 from concurrent.futures import ThreadPoolExecutor, Future
 from typing import Optional, List, Dict, Any
 
+from config import SETTINGS
+
 # Optional import of google generative ai client
 try:
     import google.generativeai as genai  # type: ignore
@@ -27,20 +28,28 @@ except Exception:
     genai = None
 
 # -------------------------
-# Config via env (tunable)
+# Config (tunable via env, read once into config.SETTINGS)
 # -------------------------
-GEMINI_ENABLED = os.getenv("GEMINI_ENABLED", "true").lower() in ("1", "true", "yes")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", None)
-GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-GEMINI_MAX_CONCURRENT = int(os.getenv("GEMINI_MAX_CONCURRENT", "3"))
-GEMINI_CACHE_TTL = int(os.getenv("GEMINI_CACHE_TTL", "300"))
-GEMINI_CALL_TIMEOUT = float(os.getenv("GEMINI_CALL_TIMEOUT", "5.0"))
+GEMINI_ENABLED = SETTINGS.gemini_enabled
+GEMINI_API_KEY = SETTINGS.gemini_api_key
+GEMINI_MODEL = SETTINGS.gemini_model
+GEMINI_MAX_CONCURRENT = SETTINGS.gemini_max_concurrent
+GEMINI_CACHE_TTL = SETTINGS.gemini_cache_ttl
+GEMINI_CALL_TIMEOUT = SETTINGS.gemini_call_timeout
+GEMINI_MIN_TOKENS = SETTINGS.gemini_min_tokens
+GEMINI_BREAKER_FAILURES = SETTINGS.gemini_breaker_failures
+GEMINI_BREAKER_COOLDOWN = SETTINGS.gemini_breaker_cooldown
+
+# Optional: bounded TTL cache + fast 64-bit hashing for cache keys
+try:
+    from cachetools import TTLCache
+except Exception:
+    TTLCache = None
 
-if GEMINI_ENABLED and genai and GEMINI_API_KEY:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-    except Exception:
-        pass
+try:
+    import xxhash
+except Exception:
+    xxhash = None
 
 # -------------------------
 # Local corrections
@@ -51,11 +60,11 @@ except Exception:
     _fproc = None
     _fuzz = None
 
-_PROTECTED_TOKENS = {
+_PROTECTED_TOKENS = frozenset({
     "hey", "agent", "open", "create", "make", "new", "file", "files",
     "notes", "note", "dot", "txt", "pdf", "docx",
     "browser", "calculator", "gmail", "email", "search",
-}
+})
 
 _SIMPLE_CORRECTIONS = {
     "bowser": "browser",
@@ -68,10 +77,8 @@ _SIMPLE_CORRECTIONS = {
     "tommorow": "tomorrow",
 }
 
-_SIMPLE_PATTERNS = [
-    (re.compile(r'\b' + re.escape(k) + r'\b', re.I), v)
-    for k, v in _SIMPLE_CORRECTIONS.items()
-]
+# Fuzzy-fix targets, built once
+_FUZZY_CANDIDATES = list(_SIMPLE_CORRECTIONS.values())
 
 # -------------------------
 # 🔐 Gemini keyword protection (FIX)
@@ -88,93 +95,106 @@ _GEMINI_PROTECTED_WORDS = [
     "browser", "calculator",
 ]
 
-def _freeze_keywords_for_gemini(text: str):
-    placeholders = {}
-    frozen = text
+_FREEZE_RE = re.compile(
+    r"\b(" + "|".join(re.escape(w) for w in _GEMINI_PROTECTED_WORDS) + r")\b",
+    re.IGNORECASE,
+)
+
 
-    for idx, word in enumerate(_GEMINI_PROTECTED_WORDS):
-        pattern = r"\b" + re.escape(word) + r"\b"
+_RESTORE_RE = re.compile(r"__KW_(\d+)__")
 
-        def repl(m):
-            key = f"__KW_{idx}__"
-            placeholders[key] = m.group(0)
-            return key
 
-        frozen = re.sub(pattern, repl, frozen, flags=re.IGNORECASE)
+def _freeze_keywords_for_gemini(text: str):
+    # placeholders[i] is the original spelling behind "__KW_{i}__"
+    placeholders: List[str] = []
+
+    def repl(m):
+        placeholders.append(m.group(0))
+        return f"__KW_{len(placeholders) - 1}__"
 
+    frozen = _FREEZE_RE.sub(repl, text)
     return frozen, placeholders
 
 
-def _restore_keywords_from_gemini(text: str, placeholders: Dict[str, str]) -> str:
-    restored = text
-    for key, original in placeholders.items():
-        restored = restored.replace(key, original)
-    return restored
+def _restore_keywords_from_gemini(text: str, placeholders: List[str]) -> str:
+    if not placeholders:
+        return text
+
+    def repl(m):
+        idx = int(m.group(1))
+        return placeholders[idx] if idx < len(placeholders) else m.group(0)
+
+    return _RESTORE_RE.sub(repl, text)
 
 
 # -------------------------
 # Correction helpers
 # -------------------------
-def apply_pre_corrections(text: str) -> str:
-    if not text:
-        return text
-    return re.sub(r'\s+', ' ', text).strip()
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_WORD_RE = re.compile(r"[^\W\d_]+")
+_WS_RE = re.compile(r"\s+")
+_SPACE_BEFORE_PUNCT_RE = re.compile(r"\s+([.,!?])")
 
 
-def apply_simple_corrections(text: str) -> str:
+def apply_pre_corrections(text: str) -> str:
     if not text:
         return text
-
-    tokens = re.findall(r"\w+|[^\w\s]", text)
-    out = []
-
-    for tok in tokens:
-        low = tok.lower()
-
-        if low in _PROTECTED_TOKENS or not low.isalpha():
-            out.append(tok)
-            continue
-
-        if low in _SIMPLE_CORRECTIONS:
-            repl = _SIMPLE_CORRECTIONS[low]
-            out.append(repl.capitalize() if tok[0].isupper() else repl)
+    return _WS_RE.sub(' ', text).strip()
+
+
+def clean_transcript(text: str) -> str:
+    """
+    Whitespace, direct and fuzzy corrections in a single tokenizer pass.
+    Returns the whitespace-normalized text untouched if no token changes.
+    """
+    pre = apply_pre_corrections(text)
+    if not pre:
+        return pre
+    return _clean_normalized(pre)
+
+
+@functools.lru_cache(maxsize=1024)
+def _clean_normalized(pre: str, threshold: int = 70) -> str:
+    # Memoized on normalized text: raw variants differing only in whitespace
+    # share one entry, and the stages are deterministic.
+    tokens = _TOKEN_RE.findall(pre)
+    out = list(tokens)
+    changed = False
+    fuzzy_idxs = []
+
+    for i, tok in enumerate(tokens):
+        if not tok.isalpha():
             continue
-
-        replaced = False
-        for pat, repl in _SIMPLE_PATTERNS:
-            if pat.fullmatch(tok):
-                out.append(repl)
-                replaced = True
-                break
-
-        if not replaced:
-            out.append(tok)
-
-    s = " ".join(out)
-    return re.sub(r'\s+([.,!?])', r'\1', s)
-
-
-def _local_fuzzy_fix(text: str, threshold: int = 70) -> str:
-    if not (_fproc and _fuzz):
-        return text
-
-    tokens = re.findall(r"\w+|[^\w\s]", text)
-    out = []
-
-    candidates = list(_SIMPLE_CORRECTIONS.values())
-
-    for tok in tokens:
-        if not tok.isalpha() or tok.lower() in _PROTECTED_TOKENS:
-            out.append(tok)
+        # islower() scans without allocating; most ASR tokens are lowercase
+        low = tok if tok.islower() else tok.lower()
+        if low in _PROTECTED_TOKENS:
             continue
 
-        match = _fproc.extractOne(tok, candidates, scorer=_fuzz.ratio)
-        if match and match[1] >= threshold:
-            out.append(match[0])
+        repl = _SIMPLE_CORRECTIONS.get(low)
+        if repl is not None:
+            out[i] = repl.capitalize() if tok[0].isupper() else repl
+            changed = True
         else:
-            out.append(tok)
-
-    return " ".join(out)
+            fuzzy_idxs.append(i)
+
+    # Score every remaining token against every candidate in one C-level call
+    if fuzzy_idxs and _fproc and _fuzz:
+        scores = _fproc.cdist(
+            [tokens[i] for i in fuzzy_idxs],
+            _FUZZY_CANDIDATES,
+            scorer=_fuzz.ratio,
+            score_cutoff=threshold,
+        )
+        best = scores.argmax(axis=1)
+        for row, i in enumerate(fuzzy_idxs):
+            col = best[row]
+            if scores[row, col] >= threshold:
+                out[i] = _FUZZY_CANDIDATES[col]
+                changed = True
+
+    if not changed:
+        return pre
+    return _SPACE_BEFORE_PUNCT_RE.sub(r'\1', " ".join(out))
 
 
 # -------------------------
@@ -186,17 +206,45 @@ _SYSTEM_PROMPT_CLEAN = (
     "Return a single cleaned line."
 )
 
+# Model handle built once at import; None when Gemini is unavailable.
+# GenerativeModel takes the system prompt up front, so each call only sends
+# the transcript; older clients fall back to get_model + a combined prompt.
+_MODEL = None
+_MODEL_HAS_SYSTEM = False
+
+if GEMINI_ENABLED and genai and GEMINI_API_KEY:
+    try:
+        genai.configure(api_key=GEMINI_API_KEY)
+        if hasattr(genai, "GenerativeModel"):
+            _MODEL = genai.GenerativeModel(
+                GEMINI_MODEL, system_instruction=_SYSTEM_PROMPT_CLEAN
+            )
+            _MODEL_HAS_SYSTEM = True
+        else:
+            _MODEL = genai.get_model(GEMINI_MODEL)
+    except Exception:
+        _MODEL = None
+        _MODEL_HAS_SYSTEM = False
+
 # -------------------------
 # Caching + concurrency
 # -------------------------
 class _TTLCache:
-    def __init__(self, ttl=300):
+    """
+    TTL + size-capped cache. Uses cachetools.TTLCache when installed, else a
+    dict that expires on read and evicts the oldest entry when full.
+    """
+
+    def __init__(self, ttl=300, maxsize=1024):
         self.ttl = ttl
-        self._data = {}
+        self.maxsize = maxsize
+        self._data = TTLCache(maxsize=maxsize, ttl=ttl) if TTLCache else {}
         self._lock = threading.Lock()
 
     def get(self, k):
         with self._lock:
+            if TTLCache is not None:
+                return self._data.get(k)
             v = self._data.get(k)
             if not v:
                 return None
@@ -208,22 +256,74 @@ class _TTLCache:
 
     def set(self, k, v):
         with self._lock:
+            if TTLCache is not None:
+                self._data[k] = v
+                return
+            if k not in self._data and len(self._data) >= self.maxsize:
+                self._data.pop(next(iter(self._data)))
             self._data[k] = (v, time.time())
 
 
-_CACHE = _TTLCache()
-_EXEC = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENT)
-_SEM = threading.Semaphore(GEMINI_MAX_CONCURRENT)
+def _cache_key(text: str) -> int:
+    """64-bit key for a transcript, so the cache doesn't hold full strings."""
+    if xxhash is not None:
+        return xxhash.xxh64(text.encode("utf-8")).intdigest()
+    return hash(text)
+
 
+_CACHE = _TTLCache(ttl=GEMINI_CACHE_TTL)
 
-def _safe_call_gemini_sync(prompt: str, timeout: float):
-    if not (genai and GEMINI_API_KEY):
+# The pool size bounds concurrent Gemini calls; it is created on first use so
+# importing this module doesn't spawn threads when Gemini is never called.
+_EXEC: Optional[ThreadPoolExecutor] = None
+_EXEC_LOCK = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _EXEC
+    if _EXEC is None:
+        with _EXEC_LOCK:
+            if _EXEC is None:
+                _EXEC = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENT)
+    return _EXEC
+
+
+# Circuit breaker: after GEMINI_BREAKER_FAILURES consecutive errors, stop
+# calling Gemini for GEMINI_BREAKER_COOLDOWN seconds.
+_GEMINI_FAILURES = 0
+_GEMINI_DISABLED_UNTIL = 0.0
+_BREAKER_LOCK = threading.Lock()
+
+
+def _gemini_available() -> bool:
+    return time.time() >= _GEMINI_DISABLED_UNTIL
+
+
+def _record_gemini_call(ok: bool) -> None:
+    global _GEMINI_FAILURES, _GEMINI_DISABLED_UNTIL
+    with _BREAKER_LOCK:
+        if ok:
+            _GEMINI_FAILURES = 0
+            return
+        _GEMINI_FAILURES += 1
+        if _GEMINI_FAILURES >= GEMINI_BREAKER_FAILURES:
+            _GEMINI_FAILURES = 0
+            _GEMINI_DISABLED_UNTIL = time.time() + GEMINI_BREAKER_COOLDOWN
+
+
+def _safe_call_gemini_sync(transcript: str, timeout: float):
+    if _MODEL is None:
         raise RuntimeError("Gemini unavailable")
 
-    with _SEM:
-        model = genai.get_model(GEMINI_MODEL)
-        resp = model.generate(input=prompt, temperature=0.0, max_output_tokens=128)
-        return (resp.text or "").strip()
+    if _MODEL_HAS_SYSTEM:
+        resp = _MODEL.generate_content(
+            transcript,
+            generation_config={"temperature": 0.0, "max_output_tokens": 128},
+        )
+    else:
+        prompt = _SYSTEM_PROMPT_CLEAN + "\n\nUser transcript:\n" + transcript
+        resp = _MODEL.generate(input=prompt, temperature=0.0, max_output_tokens=128)
+    return (resp.text or "").strip()
 
 
 # -------------------------
@@ -234,33 +334,50 @@ def enhance_transcript_sync(raw_text: str, use_cache: bool = True) -> str:
     if not raw_text:
         return raw_text
 
-    cached = _CACHE.get(raw_text)
-    if cached:
+    key = _cache_key(raw_text)
+    cached = _CACHE.get(key)
+    if cached is not None:
         return cached
 
-    pre = apply_pre_corrections(raw_text)
-    local = apply_simple_corrections(pre)
-    local_fuzzy = _local_fuzzy_fix(local)
+    words = _WORD_RE.findall(raw_text)
+    local_fuzzy = clean_transcript(raw_text)
 
     final = local_fuzzy
-    used_gemini = False
-
-    if GEMINI_ENABLED and genai and GEMINI_API_KEY:
-        try:
-            frozen, placeholders = _freeze_keywords_for_gemini(raw_text)
-            prompt = _SYSTEM_PROMPT_CLEAN + "\n\nUser transcript:\n" + frozen
-            cleaned = _safe_call_gemini_sync(prompt, GEMINI_CALL_TIMEOUT)
+    # Only settled results are cached: a failed call or an open breaker yields
+    # the local fallback, which must not outlive the breaker cooldown.
+    settled = True
+
+    # Very short transcripts aren't worth a remote round-trip
+    if len(words) >= GEMINI_MIN_TOKENS and GEMINI_ENABLED and genai and GEMINI_API_KEY:
+        if not _gemini_available():
+            settled = False
+        else:
+            try:
+                frozen, placeholders = _freeze_keywords_for_gemini(local_fuzzy)
+                cleaned = _safe_call_gemini_sync(frozen, GEMINI_CALL_TIMEOUT)
+                _record_gemini_call(ok=True)
+
+                if cleaned:
+                    final = _restore_keywords_from_gemini(cleaned, placeholders)
+            except Exception:
+                _record_gemini_call(ok=False)
+                final = local_fuzzy
+                settled = False
+
+    if settled:
+        _CACHE.set(key, final)
+    return final
 
-            if cleaned:
-                final = _restore_keywords_from_gemini(cleaned, placeholders)
-                used_gemini = True
-        except Exception:
-            final = local_fuzzy
 
-    _CACHE.set(raw_text, final)
-    return final
+def is_enhancement_settled(raw_text: str) -> bool:
+    """
+    True when enhance_transcript_sync(raw_text) currently has a cached result,
+    i.e. its last answer was not an error/breaker fallback.
+    """
+    raw_text = (raw_text or "").strip()
+    return not raw_text or _CACHE.get(_cache_key(raw_text)) is not None
 
 
 def enhance_transcript_async(raw_text: str, use_cache: bool = True) -> Future:
-    return _EXEC.submit(enhance_transcript_sync, raw_text, use_cache)
+    return _get_executor().submit(enhance_transcript_sync, raw_text, use_cache)
 
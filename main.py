@@ -3,19 +3,14 @@
 # -----------------------------------------
 # Load .env BEFORE all other imports
 # -----------------------------------------
-from dotenv import load_dotenv
-from pathlib import Path
-import os
+from bootstrap import load_env
 
-env_path = Path(__file__).resolve().parent / ".env"
-if env_path.exists():
-    load_dotenv(env_path)
-else:
-    load_dotenv()
+load_env()
 
 # -----------------------------------------
 # Standard imports AFTER .env is loaded
 # -----------------------------------------
+import logging
 import queue
 import warnings
 import numpy as np
@@ -23,7 +18,7 @@ import numpy as np
 warnings.filterwarnings("ignore", message="pkg_resources is deprecated")
 
 import config
-from audio import AudioStream, VADSegmenter, transcribe_numpy
+from audio import AudioStream, VADSegmenter, TranscriptionWorker
 from nlu import hotword_detect, endword_detect, process_text_commands
 from utils import iso_now, speak, log_nlu
 from agents.planner import Planner
@@ -39,19 +34,24 @@ except Exception as e:
     enhance_transcript_async = None
     _GEMINI_AVAILABLE = False
 
-print(f"(init) GEMINI_AVAILABLE={_GEMINI_AVAILABLE}, GEMINI_ENABLED={os.getenv('GEMINI_ENABLED')}")
+print(f"(init) GEMINI_AVAILABLE={_GEMINI_AVAILABLE}, GEMINI_ENABLED={config.SETTINGS.gemini_enabled}")
 
 # Default settings
 SAMPLE_RATE = getattr(config, "SAMPLE_RATE", 16000)
 MIC_DEVICE_INDEX = getattr(config, "MIC_DEVICE_INDEX", None)
 HOTWORD_THRESHOLD = getattr(config, "HOTWORD_THRESHOLD", 80)
-GEMINI_WAIT_TIMEOUT = float(os.getenv("GEMINI_WAIT_TIMEOUT", "2.0"))
+GEMINI_WAIT_TIMEOUT = config.SETTINGS.gemini_wait_timeout
+
+# Per-utterance output goes through logging so it can be silenced (LOG_LEVEL)
+logger = logging.getLogger(__name__)
 
 
 # -----------------------------------------
 # Main Audio Loop
 # -----------------------------------------
 def main():
+    logging.basicConfig(level=config.SETTINGS.log_level, format="%(message)s")
+
     audio = AudioStream()
     vad = VADSegmenter()
     planner = Planner()
@@ -64,6 +64,96 @@ def main():
         return
 
     mode = "idle"
+
+    def handle_text(text: str):
+        """Gemini clean-up, session control and NLU for one transcript."""
+        nonlocal mode
+
+        # -----------------------------------------
+        # GEMINI POST-PROCESSING (non-blocking)
+        # -----------------------------------------
+        if _GEMINI_AVAILABLE and enhance_transcript_async is not None:
+            try:
+                logger.debug("(gemini) scheduling enhancement...")
+                fut = enhance_transcript_async(text)
+
+                try:
+                    cleaned = fut.result(timeout=GEMINI_WAIT_TIMEOUT)
+                except Exception as e:
+                    logger.warning("(gemini) timeout/error: %s", e)
+                    cleaned = None
+
+                if cleaned and cleaned.strip() and cleaned.strip() != text.strip():
+                    logger.info("[Whisper] %s\n[Gemini]  %s", text, cleaned)
+                    text = cleaned
+                else:
+                    logger.info("[Heard] %s", text)
+
+            except Exception as e:
+                logger.warning("(gemini) post-process failed: %s", e)
+                logger.info("[Heard] %s", text)
+
+        else:
+            logger.debug("(gemini) disabled or unavailable.")
+            logger.info("[Heard] %s", text)
+
+        # -----------------------------------------
+        # HOTWORD HANDLING
+        # -----------------------------------------
+        if mode == "idle":
+            cand, score = hotword_detect(text)
+            if cand and score >= HOTWORD_THRESHOLD:
+                logger.info("🟢 Session started with: %s", cand)
+                speak("I'm listening.")
+                try:
+                    planner.sleep.keep_awake()
+                except Exception:
+                    pass
+                mode = "session"
+            return
+
+        # -----------------------------------------
+        # SESSION MODE
+        # -----------------------------------------
+        if mode == "session":
+            end_cand, end_score = endword_detect(text)
+            if end_cand and end_score >= HOTWORD_THRESHOLD:
+                logger.info("🔴 Session ended with: %s", end_cand)
+                speak("Going to sleep.")
+                try:
+                    planner.sleep.allow_sleep()
+                except Exception:
+                    pass
+                mode = "idle"
+                return
+
+            # NLU + Planner
+            cmds = process_text_commands(text)
+            if not cmds:
+                return
+
+            # All subcommands share the utterance timestamp
+            ts = iso_now()
+            for full_cmd in cmds:
+                full_cmd["module"] = "speech_nlu"
+                full_cmd["ts"] = ts
+
+                try:
+                    log_nlu(full_cmd)
+                except Exception as e:
+                    logger.warning("(log) log_nlu error: %s", e)
+
+                try:
+                    planner.handle(full_cmd)
+                except Exception as e:
+                    logger.error("[ERROR] Planner error: %s", e)
+                    speak("I ran into an error while handling that.")
+
+    # Whisper and everything downstream run on this worker; the loop below
+    # only reads frames and segments them, so capture never stalls on ASR.
+    asr = TranscriptionWorker(handle_text, maxsize=2)
+    asr.start()
+
     print("🎧 Say 'hey agent' to start a session. Say 'bye agent' to stop listening.")
     speak("Agent initialized and sleeping. Say hey agent to wake me.")
 
@@ -86,96 +176,8 @@ def main():
             if seg is None:
                 continue
 
-            # ---------------------------------
-            # Whisper transcription
-            # ---------------------------------
-            utt = seg.astype(np.float32)
-            text, _, _ = transcribe_numpy(utt)
-            if not text:
-                continue
-
-            # -----------------------------------------
-            # GEMINI POST-PROCESSING (non-blocking)
-            # -----------------------------------------
-            if _GEMINI_AVAILABLE and enhance_transcript_async is not None:
-                try:
-                    print("(gemini) scheduling enhancement...")
-                    fut = enhance_transcript_async(text)
-
-                    try:
-                        cleaned = fut.result(timeout=GEMINI_WAIT_TIMEOUT)
-                    except Exception as e:
-                        print(f"(gemini) timeout/error: {e}")
-                        cleaned = None
-
-                    if cleaned and cleaned.strip() and cleaned.strip() != text.strip():
-                        print(f"[Whisper] {text}")
-                        print(f"[Gemini]  {cleaned}")
-                        text = cleaned
-                    else:
-                        print("(gemini) no change.")
-                        print(f"[Heard] {text}")
-
-                except Exception as e:
-                    print(f"(gemini) post-process failed: {e}")
-                    print(f"[Heard] {text}")
-
-            else:
-                print("(gemini) disabled or unavailable.")
-                print(f"[Heard] {text}")
-
-            # -----------------------------------------
-            # HOTWORD HANDLING
-            # -----------------------------------------
-            if mode == "idle":
-                cand, score = hotword_detect(text)
-                if cand and score >= HOTWORD_THRESHOLD:
-                    print(f"🟢 Session started with: {cand}")
-                    speak("I'm listening.")
-                    try:
-                        planner.sleep.keep_awake()
-                    except Exception:
-                        pass
-                    mode = "session"
-                continue
-
-            # -----------------------------------------
-            # SESSION MODE
-            # -----------------------------------------
-            if mode == "session":
-                end_cand, end_score = endword_detect(text)
-                if end_cand and end_score >= HOTWORD_THRESHOLD:
-                    print(f"🔴 Session ended with: {end_cand}")
-                    speak("Going to sleep.")
-                    try:
-                        planner.sleep.allow_sleep()
-                    except Exception:
-                        pass
-                    mode = "idle"
-                    continue
-
-                # NLU + Planner
-                cmds = process_text_commands(text)
-                if not cmds:
-                    continue
-
-                for partial in cmds:
-                    full_cmd = {
-                        "module": "speech_nlu",
-                        "ts": iso_now(),
-                        **partial,
-                    }
-
-                    try:
-                        log_nlu(full_cmd)
-                    except Exception as e:
-                        print(f"(log) log_nlu error: {e}")
-
-                    try:
-                        planner.handle(full_cmd)
-                    except Exception as e:
-                        print(f"[ERROR] Planner error: {e}")
-                        speak("I ran into an error while handling that.")
+            # VADSegmenter already emits a fresh float32 array; no second copy
+            asr.submit(seg.astype(np.float32, copy=False))
 
     except KeyboardInterrupt:
         print("\nStopped.")
@@ -184,6 +186,7 @@ def main():
             audio.stop()
         except Exception:
             pass
+        asr.stop()
         print("Audio stopped. Bye.")
         speak("Shutting down audio. Bye.")
 
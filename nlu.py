@@ -11,7 +11,11 @@ Behavior:
 - If cleaned text yields no intent, fall back to the original raw text for local rules.
 """
 
+import copy
+import functools
 import re
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Tuple, Any
 
 import dateparser
@@ -21,6 +25,32 @@ from rapidfuzz import fuzz, process as fprocess
 from config import HOTWORDS, SESSION_END_WORDS
 from utils import speak
 
+# Optional: Aho-Corasick automaton for one-pass keyword scanning
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Optional: RE2 (linear-time DFA engine, no catastrophic backtracking)
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+
+def _compile(pattern: str, flags: int = 0):
+    """
+    Compile a rule pattern with RE2 when installed, else with `re`.
+    Patterns using \\w / \\W stay on `re`: RE2's word classes are ASCII-only,
+    which would split non-English file names.
+    """
+    if re2 is not None and not (flags & ~re.I) and "\\w" not in pattern and "\\W" not in pattern:
+        try:
+            return re2.compile(("(?i)" if flags & re.I else "") + pattern)
+        except Exception:
+            pass
+    return re.compile(pattern, flags)
+
 # Try to import gemini_helper functions (optional)
 try:
     import gemini_helper as _gemini
@@ -37,6 +67,16 @@ except Exception as e:
     nlp = None
     speak("SpaCy model failed to load; entity extraction may not work.")
 
+# NER in the small English pipeline carries its own tok2vec; drop the shared
+# one when nothing still enabled listens to it.
+if nlp is not None and "tok2vec" in nlp.pipe_names:
+    try:
+        listeners = set(getattr(nlp.get_pipe("tok2vec"), "listening_components", []) or [])
+        if not listeners & set(nlp.pipe_names):
+            nlp.disable_pipe("tok2vec")
+    except Exception:
+        pass
+
 
 # small helper: words -> numbers for common ordinals/cards
 _ORDINALS = {
@@ -47,6 +87,173 @@ _ORDINALS = {
 }
 
 
+# --------- Precompiled rule patterns / keyword tables ---------
+# Keyword tables are matched as substrings of the lowered text (phrases
+# included), so they stay tuples rather than token sets.
+_ORDINAL_ALT = '|'.join(map(re.escape, _ORDINALS))
+
+_RE_OPEN_OPTION_NUM = _compile(r'\b(open|book|go to)\s+(?:the\s+)?(?:option\s+)?\d+\b')
+_RE_OPEN_OPTION_ORDINAL = _compile(
+    r'\b(open|book|go to)\s+(?:the\s+)?(?:option\s+)?(?:' + _ORDINAL_ALT + r')\b'
+)
+_RE_CLOSE_TAB = _compile(r'\b(close|closed|shut)\s+(this\s+|the\s+|current\s+)?tab\b')
+_RE_NEW_TAB = _compile(r'\b(new|open)\s+(a\s+)?tab\b|\bopen\s+new\s+tab\b')
+_RE_OPEN_FILE_MANAGER = _compile(
+    r'\b(open|show|browse)\s+(the\s+)?(file manager|files|file explorer|filebrowser|file manager)\b'
+    r'|\bopen\s+files\b'
+)
+_RE_FILE_VERB = _compile(
+    r'\b(?P<verb>open|create|make|new|delete|remove)\s+(?:a\s+)?file(?:\s+(?P<fname>[\w\-\.\' ]+(?:\s+dot\s+[a-z0-9]{1,8})?))?\b'
+)
+_RE_MAIL_WORD = _compile(r'\b(email|emails|mail|mails|inbox|gmail)\b')
+_RE_MAIL_MSG = _compile(r'\b(mail|email|message)\b')
+_RE_OPEN_SETTINGS = _compile(r'\b(open|launch)\s+(system\s*)?settings\b')
+_RE_FOLDER_OPEN = _compile(
+    r'\bopen\s+(?:the\s+)?(home|downloads?|documents?|desktop|pictures?|music|videos?|recent|trash)\s*(folder)?\b'
+)
+_RE_CLOSE_FILE = _compile(r'\bclose\b.*\bfile\b')
+
+_MAIL_READ_KW = ("show me", "check", "latest", "recent", "unread", "open", "read")
+_MAIL_ALOUD_KW = ("loud", "aloud", "speak", "subject")
+_SETTINGS_PHRASES = frozenset({"settings", "system settings"})
+_BOOKING_KW = (
+    "flight", "flights", "bus", "buses", "train", "trains",
+    "movie", "movies", "tickets", "ticket",
+    "hotel", "hotels", "stay", "book", "booking", "bookings",
+)
+# Utterance openers that mean booking.search; str.startswith takes the tuple
+# and checks every prefix in C.
+_BOOKING_PREFIXES = ("show me the cheapest",)
+_FILE_OPS_KW = (
+    "open file", "create file", "make file", "new file", "edit file", "delete file", "remove file",
+    "open files", "file manager", "files app", "open downloads", "open documents",
+)
+_FILE_CATCHALL_KW = (
+    "file manager", "files app", "open files", "open file manager", "create a file",
+    "make a file", "new file", "open downloads", "open documents", "open desktop",
+    "settings", "open settings", "system settings", "write", "append", "save",
+    "delete file", "remove file", "erase file", "trash",
+)
+_PROCESS_KW = (
+    "task manager", "open task manager", "show task manager", "system monitor",
+    "which process makes it slow", "top cpu", "top memory", "top ram", "show cpu processes",
+    "show memory processes", "slow processes", "high cpu", "high memory", "why is it slow", "lag",
+)
+_SLEEP_KW = (
+    "don't sleep", "dont sleep", "keep awake", "keep running", "prevent sleep",
+    "caffeinate", "stay awake", "keep system awake", "no sleep",
+    "allow sleep", "stop preventing sleep", "let it sleep",
+    "disable keep awake", "stop keep awake",
+)
+_BROWSER_KW = (
+    "new tab", "close tab", "next tab", "previous tab", "prev tab", "back", "forward",
+    "scroll down", "scroll up", "scroll to top", "scroll to bottom",
+    "go to ", "open url", "open website", "focus address bar", "address bar",
+    "browser search", "type in address bar",
+)
+_SEARCH_KW = ("search", "find", "look up", "google", "web search")
+_SEARCH_STRIP = ("search for", "search", "find", "look up", "google", "web search", "on the web", "in browser")
+_CLOSE_KW = ("close", "quit", "exit", "force close", "kill process", "stop")
+
+_APP_KW = (
+    "chrome", "calculator", "terminal", "spotify", "vscode", "firefox",
+    "settings", "music", "vlc", "rhythmbox", "code",
+    "gnome-calculator", "galculator", "kcalc",
+)
+_CALCULATOR_ALIASES = frozenset({"gnome-calculator", "galculator", "kcalc", "calculator"})
+_DIR_KW = ("downloads", "documents", "desktop", "pictures", "music", "videos", "home")
+_DIR_TARGETS = frozenset({"home", "downloads", "documents", "desktop", "pictures", "music", "videos"})
+
+# Keyword groups consulted by refine_intent; every group is resolved in a
+# single scan of the text (see _keyword_groups), and the "trig_*" groups
+# decide which regex rules can match at all.
+_KW_GROUPS = {
+    "mail_read": _MAIL_READ_KW,
+    "mail_aloud": _MAIL_ALOUD_KW,
+    "booking": _BOOKING_KW,
+    "file_ops": _FILE_OPS_KW,
+    "remind": ("remind",),
+    "file_catchall": _FILE_CATCHALL_KW,
+    "process": _PROCESS_KW,
+    "sleep": _SLEEP_KW,
+    "browser": _BROWSER_KW,
+    "search": _SEARCH_KW,
+    "browser_search": ("browser search",),
+    "open": ("open", "launch"),
+    "play": ("play",),
+    "close": _CLOSE_KW,
+    # Literal triggers: a regex rule only runs when every word it needs is present
+    "trig_option": ("open", "book", "go to"),
+    "trig_tab": ("tab",),
+    "trig_file": ("file",),
+    "trig_mail": ("mail", "inbox"),
+    "trig_message": ("mail", "message"),
+    "trig_settings": ("settings",),
+    "trig_close": ("close",),
+}
+
+
+def _build_keyword_automaton():
+    if ahocorasick is None:
+        return None
+    groups_by_kw: Dict[str, set] = {}
+    for group, kws in _KW_GROUPS.items():
+        for kw in kws:
+            groups_by_kw.setdefault(kw, set()).add(group)
+    ac = ahocorasick.Automaton()
+    for kw, groups in groups_by_kw.items():
+        ac.add_word(kw, tuple(groups))
+    ac.make_automaton()
+    return ac
+
+
+_KW_AUTOMATON = _build_keyword_automaton()
+
+
+def _keyword_groups(t: str) -> set:
+    """Names of every _KW_GROUPS entry with a keyword occurring in `t`."""
+    if _KW_AUTOMATON is not None:
+        hits = set()
+        for _, groups in _KW_AUTOMATON.iter(t):
+            hits.update(groups)
+        return hits
+    return {g for g, kws in _KW_GROUPS.items() if any(k in t for k in kws)}
+
+
+# spaCy NER only feeds DATE/TIME into normalize_entities; texts without any
+# time-ish word skip it (everything else is regex-based).
+_HAS_TIME_HINT = _compile(
+    r"\b(?:today|tomorrow|tonight|yesterday|morning|afternoon|evening|noon|midnight"
+    r"|now|o'?clock|am|pm|a\.m|p\.m|\d{1,2}:\d{2}|\d{1,2}\s*(?:am|pm)"
+    r"|\d{1,2}(?:st|nd|rd|th)|\d{1,2}/\d{1,2}(?:/\d{2,4})?"
+    r"|monday|tuesday|wednesday|thursday|friday|saturday|sunday|weekend"
+    r"|january|february|march|april|may|june|july|august|september|october|november|december"
+    r"|jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec"
+    r"|seconds?|minutes?|mins?|hours?|hrs?|days?|weeks?|months?|years?)\b",
+    re.I,
+)
+
+# English only skips dateparser's language detection; commands refer ahead
+_DATEPARSER_LANGS = ["en"]
+_DATEPARSER_SETTINGS = {"RETURN_AS_TIMEZONE_AWARE": False, "PREFER_DATES_FROM": "future"}
+
+_RE_SUBCOMMAND_SPLIT = _compile(r'\s+(?:and|then|,)\s+', re.I)
+_RE_OPTION_NUM = _compile(r'\boption\s+(\d+)\b', re.I)
+_RE_ANY_ORDINAL = _compile(r'\b(?:option\s+)?(' + _ORDINAL_ALT + r')\b', re.I)
+_RE_DOT_FILE = _compile(r"([\w\-\s']+?)\s+(?:dot|period|\.)\s+([a-z0-9]{1,8})\b", re.I)
+_RE_FILE_EXT = _compile(r"([\w\-'.]+\.(?:txt|pdf|docx|csv|md|py|json|ya?ml))\b", re.I)
+_RE_GOTO = _compile(r"(?:go to|open url|open website)\s+(.+)$", re.I)
+_RE_WS = _compile(r'\s+')
+# spoken "dot"/"period" or a literal '.', with surrounding spaces, -> '.'
+_RE_URL_DOT = _compile(r'\s*(?:\b(?:dot|period)\b|\.)\s*', re.I)
+_RE_HOST_WORD = _compile(r'[A-Za-z0-9\-]+')
+_RE_TLD = _compile(r'\b(com|org|net|io|co|in)\b', re.I)
+_RE_BARE_HOST = _compile(r'[A-Za-z0-9\-]{2,30}')
+_RE_QWRITE = _compile(
+    r'(?:write|append|add|create|make)\s+(?P<content>"[^"]+"|\'[^\']+\')\s+(?:to|in|into)\s+(?P<target>[^,;]+)'
+)
+
+
 # --------- Intent refinement / detection ---------
 
 def refine_intent(intent: str, text: str) -> str:
@@ -56,144 +263,134 @@ def refine_intent(intent: str, text: str) -> str:
     """
     t = (text or "").lower().strip()
 
+    # One scan resolves every keyword group and regex trigger below
+    hits = _keyword_groups(t)
+
     # --- Booking follow-ups like "open option 1" or "open option one" ---
     # map to booking.search so Planner routes to BookingAgent
-    if re.search(r'\b(open|book|go to)\s+(?:the\s+)?(?:option\s+)?\d+\b', t) or \
-       re.search(r'\b(open|book|go to)\s+(?:the\s+)?(?:option\s+)?(?:' + '|'.join(_ORDINALS.keys()) + r')\b', t):
+    if "trig_option" in hits and (_RE_OPEN_OPTION_NUM.search(t) or _RE_OPEN_OPTION_ORDINAL.search(t)):
         return "booking.search"
 
     # --- Explicit browser tab controls: prefer these BEFORE generic 'close' ---
-    if re.search(r'\b(close|closed|shut)\s+(this\s+|the\s+|current\s+)?tab\b', t):
-        return "browser.control"
-    if re.search(r'\b(new|open)\s+(a\s+)?tab\b', t) or re.search(r'\bopen\s+new\s+tab\b', t):
+    if "trig_tab" in hits and (_RE_CLOSE_TAB.search(t) or _RE_NEW_TAB.search(t)):
         return "browser.control"
 
-    # --- Explicit: open files / file manager -> treat as file manager open ---
-    if re.search(r'\b(open|show|browse)\s+(the\s+)?(file manager|files|file explorer|filebrowser|file manager)\b', t):
-        return "file.manage"
-    if re.search(r'\bopen\s+files\b', t):
-        return "file.manage"
-
-    # --- File operations: capture optional filename ---
-    m_file = re.search(
-        r'\b(?P<verb>open|create|make|new|delete|remove)\s+(?:a\s+)?file(?:\s+(?P<fname>[\w\-\.\' ]+(?:\s+dot\s+[a-z0-9]{1,8})?))?\b',
-        t
-    )
-    if m_file:
-        fname = m_file.group("fname")
-        if fname:
+    if "trig_file" in hits:
+        # --- Explicit: open files / file manager -> treat as file manager open ---
+        if _RE_OPEN_FILE_MANAGER.search(t):
             return "file.manage"
-        else:
-            return "file.manage.missing_filename"
+
+        # --- File operations: capture optional filename ---
+        m_file = _RE_FILE_VERB.search(t)
+        if m_file:
+            fname = m_file.group("fname")
+            if fname:
+                return "file.manage"
+            else:
+                return "file.manage.missing_filename"
 
     # --- Mail / email intents ---
-    if re.search(r'\b(email|emails|mail|mails|inbox|gmail)\b', t) and any(
-        w in t for w in ["show me", "check", "latest", "recent", "unread", "open", "read"]
-    ):
+    if "mail_read" in hits and "trig_mail" in hits and _RE_MAIL_WORD.search(t):
         return "mail.read"
-    if re.search(r'\b(mail|email|message)\b' , t) and any(
-        w in t for w in ["loud", "aloud", "speak", "subject"]
-    ):
+    if "mail_aloud" in hits and "trig_message" in hits and _RE_MAIL_MSG.search(t):
         return "mail.read"
 
     # Settings
-    if (
-        re.search(r'\b(open|launch)\s+(system\s*)?settings\b', t)
-        or t in {"settings", "system settings"}
-    ):
+    if "trig_settings" in hits and (_RE_OPEN_SETTINGS.search(t) or t in _SETTINGS_PHRASES):
         return "app.open"
 
     # Booking / commerce intents (search)
-    booking_kw = [
-        "flight", "flights", "bus", "buses", "train", "trains",
-        "movie", "movies", "tickets", "ticket",
-        "hotel", "hotels", "stay", "book", "booking", "bookings"
-    ]
-    if any(k in t for k in booking_kw) or t.startswith("show me the cheapest"):
+    if "booking" in hits or t.startswith(_BOOKING_PREFIXES):
         return "booking.search"
 
     # Folder opens → file.manage
-    if re.search(
-        r'\bopen\s+(?:the\s+)?(home|downloads?|documents?|desktop|pictures?|music|videos?|recent|trash)\s*(folder)?\b',
-        t
-    ):
+    if "open" in hits and _RE_FOLDER_OPEN.search(t):
         return "file.manage"
 
     # File ops catch-all
-    if any(w in t for w in [
-        "open file", "create file", "make file", "new file", "edit file", "delete file", "remove file",
-        "open files", "file manager", "files app", "open downloads", "open documents"
-    ]):
+    if "file_ops" in hits:
         return "file.manage"
 
-    if "remind" in t:
+    if "remind" in hits:
         return "reminder.create"
 
-    if re.search(r'\bclose\b.*\bfile\b', t):
+    if "trig_close" in hits and "trig_file" in hits and _RE_CLOSE_FILE.search(t):
         return "file.manage"
 
-    if any(w in t for w in [
-        "file manager", "files app", "open files", "open file manager", "create a file",
-        "make a file", "new file", "open downloads", "open documents", "open desktop",
-        "settings", "open settings", "system settings", "write", "append", "save",
-        "delete file", "remove file", "erase file", "trash"
-    ]):
+    if "file_catchall" in hits:
         return "file.manage"
 
-    if any(w in t for w in [
-        "task manager", "open task manager", "show task manager", "system monitor",
-        "which process makes it slow", "top cpu", "top memory", "top ram", "show cpu processes",
-        "show memory processes", "slow processes", "high cpu", "high memory", "why is it slow", "lag"
-    ]):
+    if "process" in hits:
         return "process.monitor"
 
-    if any(w in t for w in [
-        "don't sleep", "dont sleep", "keep awake", "keep running", "prevent sleep",
-        "caffeinate", "stay awake", "keep system awake", "no sleep",
-        "allow sleep", "stop preventing sleep", "let it sleep",
-        "disable keep awake", "stop keep awake"
-    ]):
+    if "sleep" in hits:
         return "sleep.control"
 
-    if any(w in t for w in [
-        "new tab", "close tab", "next tab", "previous tab", "prev tab", "back", "forward",
-        "scroll down", "scroll up", "scroll to top", "scroll to bottom",
-        "go to ", "open url", "open website", "focus address bar", "address bar",
-        "browser search", "type in address bar"
-    ]):
+    if "browser" in hits:
         return "browser.control"
 
     # Generic web search
-    if any(w in t for w in ["search", "find", "look up", "google", "web search"]) and "browser search" not in t:
+    if "search" in hits and "browser_search" not in hits:
         return "web.search"
 
     # default app open
-    if "open" in t or "launch" in t:
+    if "open" in hits:
         return "app.open"
 
-    if "play" in t:
+    if "play" in hits:
         return "music.play"
 
     # Now generic single-word/short 'close' -> fallback to 'close' (app close)
-    if any(w in t for w in [
-        "close", "quit", "exit", "force close", "kill process", "stop"
-    ]):
+    if "close" in hits:
         return "close"
 
     return intent
 
 
-def detect_intent(text: str) -> Tuple[str, float]:
+class _Unsettled(Exception):
     """
-    Detect intent with the following preference:
-      1) local rule (refine_intent) on given text
-      2) if that is 'unknown' and Gemini available, try LLM refine
-      3) otherwise, return local label (may be 'unknown')
+    Raised inside memoized helpers to hand back a fallback result without
+    lru_cache storing it (Gemini error / breaker path); callers retry later.
     """
-    t_in = (text or "").strip()
-    if not t_in:
-        return "unknown", 0.0
 
+    def __init__(self, result=None):
+        super().__init__()
+        self.result = result
+
+
+@functools.lru_cache(maxsize=256)
+def _refine_intent_llm(text: str):
+    """
+    gemini_helper.refine_intent_sync(text), memoized so detect_intent and
+    _prepare_command share one LLM round-trip for the same cleaned text.
+    Returns None when unavailable; callers must not mutate the result.
+    Raises _Unsettled when the call fails, so failures are not memoized.
+    """
+    fn = getattr(_gemini, "refine_intent_sync", None)
+    if not (GEMINI_AVAILABLE and callable(fn)):
+        return None
+    try:
+        res = fn(text)
+    except Exception as e:
+        raise _Unsettled() from e
+    if res is None:
+        raise _Unsettled()
+    return res
+
+
+def _cleaning_settled(text: str) -> bool:
+    """False when gemini_helper's clean-up of `text` was an error/breaker fallback."""
+    fn = getattr(_gemini, "is_enhancement_settled", None)
+    if not (GEMINI_AVAILABLE and callable(fn)):
+        return True
+    try:
+        return bool(fn(text))
+    except Exception:
+        return False
+
+
+@functools.lru_cache(maxsize=512)
+def _detect_intent_memo(t_in: str) -> Tuple[str, float]:
     # 1) local rules first
     try:
         local_label = refine_intent("unknown", t_in)
@@ -203,40 +400,86 @@ def detect_intent(text: str) -> Tuple[str, float]:
     if local_label and local_label != "unknown":
         return local_label, 1.0
 
+    fallback = (local_label, 0.0 if local_label == "unknown" else 1.0)
+
     # 2) local could not decide => try gemini refine (if available)
     try:
-        from gemini_helper import refine_intent_sync, GEMINI_ENABLED as _G_ENABLED
-        if _G_ENABLED and callable(refine_intent_sync):
-            try:
-                res = refine_intent_sync(t_in)
-                if isinstance(res, dict):
-                    intent = res.get("intent") or "unknown"
-                    conf = float(res.get("confidence", 0.0))
-                    if intent and intent != "unknown" and conf > 0.1:
-                        return intent, max(0.0, min(1.0, conf))
-            except Exception:
-                pass
+        res = _refine_intent_llm(t_in)
+        if isinstance(res, dict):
+            intent = res.get("intent") or "unknown"
+            conf = float(res.get("confidence", 0.0))
+            if intent and intent != "unknown" and conf > 0.1:
+                return intent, max(0.0, min(1.0, conf))
+    except _Unsettled:
+        raise _Unsettled(fallback)
     except Exception:
         pass
 
     # fallback
-    return local_label, 0.0 if local_label == "unknown" else 1.0
+    return fallback
+
+
+def _detect_intent(text: str) -> Tuple[str, float, bool]:
+    """detect_intent plus whether the answer is settled (safe to memoize downstream)."""
+    t_in = (text or "").strip()
+    if not t_in:
+        return "unknown", 0.0, True
+    try:
+        label, conf = _detect_intent_memo(t_in)
+        return label, conf, True
+    except _Unsettled as e:
+        label, conf = e.result
+        return label, conf, False
+
+
+def detect_intent(text: str) -> Tuple[str, float]:
+    """
+    Detect intent with the following preference:
+      1) local rule (refine_intent) on given text
+      2) if that is 'unknown' and Gemini available, try LLM refine
+      3) otherwise, return local label (may be 'unknown')
+    Memoized, except for answers produced while the LLM call failed.
+    """
+    label, conf, _ = _detect_intent(text)
+    return label, conf
 
 
 # --------- Entities / normalization ---------
 
+def _doc_entities(doc) -> List[Dict[str, str]]:
+    return [{"label": e.label_, "text": e.text} for e in doc.ents]
+
+
 def extract_entities(text: str) -> List[Dict[str, str]]:
     if not nlp:
         return []
     try:
-        return [{"label": e.label_, "text": e.text} for e in nlp(text).ents]
+        return _doc_entities(nlp(text))
     except Exception:
         return []
 
 
+def _needs_ner(prep: Dict[str, Any]) -> bool:
+    return prep["intent_label"] == "reminder.create" or bool(
+        _HAS_TIME_HINT.search(prep["entity_source_text"])
+    )
+
+
+def extract_entities_batch(texts: List[str]) -> List[List[Dict[str, str]]]:
+    """extract_entities for several texts with one nlp.pipe call."""
+    if not texts:
+        return []
+    if not nlp:
+        return [[] for _ in texts]
+    try:
+        return [_doc_entities(doc) for doc in nlp.pipe(texts, batch_size=len(texts))]
+    except Exception:
+        return [extract_entities(t) for t in texts]
+
+
 def split_into_subcommands(sentence: str) -> List[str]:
     s = (sentence or "").strip()
-    parts = re.split(r'\s+(?:and|then|,)\s+', s, flags=re.I)
+    parts = _RE_SUBCOMMAND_SPLIT.split(s)
     return [p.strip() for p in parts if p.strip()]
 
 
@@ -248,16 +491,16 @@ def _parse_option_index(text: str) -> int | None:
     if not text:
         return None
     # digits first
-    m = re.search(r'\boption\s+(\d+)\b', text, re.IGNORECASE)
+    m = _RE_OPTION_NUM.search(text)
     if m:
         try:
             return int(m.group(1))
         except Exception:
             pass
-    # words / ordinals
-    for w, v in _ORDINALS.items():
-        if re.search(r'\b(?:option\s+)?' + re.escape(w) + r'\b', text, re.IGNORECASE):
-            return v
+    # words / ordinals (first one spoken)
+    m = _RE_ANY_ORDINAL.search(text)
+    if m:
+        return _ORDINALS[m.group(1).lower()]
     return None
 
 
@@ -266,101 +509,88 @@ def normalize_entities(entities: List[Dict[str, str]], text: str) -> Dict[str, s
     t_raw = (text or "").strip()
     lower = t_raw.lower()
 
-    # Date / time
-    times = [
-        dateparser.parse(e["text"])
-        for e in entities
-        if e.get("label") in ("DATE", "TIME") and dateparser.parse(e["text"])
-    ]
-    if times:
-        norm["datetime"] = times[0].isoformat()
+    # Date / time: first DATE/TIME entity that parses (each parsed once)
+    for e in entities:
+        if e.get("label") in ("DATE", "TIME"):
+            dt = dateparser.parse(
+                e["text"], languages=_DATEPARSER_LANGS, settings=_DATEPARSER_SETTINGS
+            )
+            if dt:
+                norm["datetime"] = dt.isoformat()
+                break
 
     # App names
-    for kw in [
-        "chrome", "calculator", "terminal", "spotify", "vscode", "firefox",
-        "settings", "music", "vlc", "rhythmbox", "code",
-        "gnome-calculator", "galculator", "kcalc"
-    ]:
+    for kw in _APP_KW:
         if kw in lower:
-            norm["application"] = (
-                "calculator"
-                if kw in ("gnome-calculator", "galculator", "kcalc", "calculator")
-                else kw
-            )
+            norm["application"] = "calculator" if kw in _CALCULATOR_ALIASES else kw
             break
 
     # File names: assemble spoken "name dot ext" into name.ext
-    m_dot = re.search(r"([\w\-\s']+?)\s+(?:dot|period|\.)\s+([a-z0-9]{1,8})\b", t_raw, re.IGNORECASE)
+    m_dot = _RE_DOT_FILE.search(t_raw)
     if m_dot:
         base = m_dot.group(1).strip().replace(" ", "_")
         ext = m_dot.group(2).strip()
         filename = f"{base}.{ext}"
         norm["file"] = filename
     else:
-        for token in re.findall(r"[\w\-\.\']+", t_raw):
-            if any(token.lower().endswith(ext) for ext in [
-                ".txt", ".pdf", ".docx", ".csv", ".md", ".py", ".json", ".yaml", ".yml"
-            ]):
-                norm["file"] = token.strip("'\"")
-                break
+        m_ext = _RE_FILE_EXT.search(t_raw)
+        if m_ext:
+            norm["file"] = m_ext.group(1).strip("'\"")
 
     # Directories
-    for dir_kw in ["downloads", "documents", "desktop", "pictures", "music", "videos", "home"]:
+    for dir_kw in _DIR_KW:
         if dir_kw in lower:
             norm["directory"] = dir_kw
             break
 
     # Web search query
-    if any(w in lower for w in ["search", "find", "look up", "google", "web search"]):
+    if any(w in lower for w in _SEARCH_KW):
         q = t_raw
-        for w in ["search for", "search", "find", "look up", "google", "web search", "on the web", "in browser"]:
+        for w in _SEARCH_STRIP:
             q = q.replace(w, "")
         norm["search_query"] = q.strip()
 
     # Go-to target (URL or domain)
-    m = re.search(r"(?:go to|open url|open website)\s+(.+)$", t_raw, re.IGNORECASE)
+    m = _RE_GOTO.search(t_raw)
     if m:
         raw_target = m.group(1).strip()
 
-        # Basic cleanup: collapse repeated spaces, normalize ' dot ' -> '.'
-        s = re.sub(r'\s+', ' ', raw_target).strip()
-        # replace spoken "dot" with '.' (handle 'dot' and when user says 'dot com')
-        s = re.sub(r'\b(dot|period)\b', '.', s, flags=re.IGNORECASE)
-
-        # Remove spaces around dots
-        s = re.sub(r'\s*\.\s*', '.', s)
+        # Basic cleanup: collapse repeated spaces, then turn spoken "dot"/"period"
+        # and any spaced-out '.' into a bare '.' (handles 'dot com') in one pass
+        s = _RE_WS.sub(' ', raw_target).strip()
+        s = _RE_URL_DOT.sub('.', s)
 
         # If it's multiple words with no dots, try to collapse likely hostname words:
         parts = s.split()
         if len(parts) == 1:
             candidate = parts[0]
         else:
-            if all(re.fullmatch(r'[A-Za-z0-9\-]+', p) for p in parts) and len(parts) <= 3:
+            if all(_RE_HOST_WORD.fullmatch(p) for p in parts) and len(parts) <= 3:
                 candidate = ''.join(parts)
             else:
                 candidate = s  # multi-word, likely search phrase; leave as-is
 
         cand = candidate.strip()
-        if re.search(r'\.', cand):
+        if '.' in cand:
             cand = cand.strip('. ')
             norm["goto_target"] = cand
         else:
-            if re.search(r'\b(com|org|net|io|co|in)\b', raw_target, re.IGNORECASE):
-                cand2 = re.sub(r'\b(com|org|net|io|co|in)\b', '', cand, flags=re.IGNORECASE).strip()
+            if _RE_TLD.search(raw_target):
+                cand2 = _RE_TLD.sub('', cand).strip()
                 if cand2:
                     cand = cand2 + '.com'
                 norm["goto_target"] = cand
             else:
-                if re.fullmatch(r'[A-Za-z0-9\-]{2,30}', cand):
+                if _RE_BARE_HOST.fullmatch(cand):
                     cand_with_com = cand + '.com'
                     norm["goto_target"] = cand_with_com
                 else:
                     norm["goto_target"] = s
 
     # Browser actions (explicit)
-    if re.search(r'\b(close|closed|shut)\s+(this\s+|the\s+|current\s+)?tab\b', lower):
+    if _RE_CLOSE_TAB.search(lower):
         norm["browser_action"] = "close_tab"
-    elif re.search(r'\b(new|open)\s+(a\s+)?tab\b', lower) or re.search(r'\bopen\s+new\s+tab\b', lower):
+    elif _RE_NEW_TAB.search(lower):
         norm["browser_action"] = "new_tab"
 
     # Booking option extraction: "open option 1" or "open first option"
@@ -370,14 +600,11 @@ def normalize_entities(entities: List[Dict[str, str]], text: str) -> Dict[str, s
         norm["option"] = int(opt)
 
     # Quick "write/append" pattern
-    m_qwrite = re.search(
-        r'(?:write|append|add|create|make)\s+(?P<content>"[^"]+"|\'[^\']+\')\s+(?:to|in|into)\s+(?P<target>[^,;]+)',
-        lower,
-    )
+    m_qwrite = _RE_QWRITE.search(lower)
     if m_qwrite:
         norm["content"] = m_qwrite.group("content")[1:-1]
         tgt = m_qwrite.group("target").strip().strip('\'"')
-        if tgt in {"home", "downloads", "documents", "desktop", "pictures", "music", "videos"}:
+        if tgt in _DIR_TARGETS:
             norm["directory"] = tgt
         else:
             norm["file"] = tgt
@@ -387,26 +614,51 @@ def normalize_entities(entities: List[Dict[str, str]], text: str) -> Dict[str, s
 
 # --------- Hotword / endword detection ---------
 
-def hotword_detect(text: str):
+# An utterance that *is* a wake phrase (ignoring case/punctuation) scores 100
+# without fuzzy matching. Anything longer is scored as a whole with
+# token_sort_ratio, so a phrase embedded in a sentence ("stop listening to
+# music") doesn't trigger. Below the cutoff rapidfuzz stops early and nothing
+# is returned; callers act at HOTWORD_THRESHOLD (>= the cutoff).
+_FUZZY_WAKE_CUTOFF = 70
+_RE_WAKE_PUNCT = re.compile(r"[^\w\s]")
+
+
+def _wake_key(text: str) -> str:
+    return " ".join(_RE_WAKE_PUNCT.sub(" ", text.lower()).split())
+
+
+def _phrase_keys(phrases: List[str]) -> Dict[str, str]:
+    return {_wake_key(p): p for p in phrases}
+
+
+_HOTWORD_KEYS = _phrase_keys(HOTWORDS)
+_ENDWORD_KEYS = _phrase_keys(SESSION_END_WORDS)
+
+
+def _wake_detect(text: str, phrases: List[str], exact: Dict[str, str]):
     if not text.strip():
         return None, 0
-    cand, score, *_ = fprocess.extractOne(
+    cand = exact.get(_wake_key(text))
+    if cand is not None:
+        return cand, 100
+    res = fprocess.extractOne(
         text.lower(),
-        HOTWORDS,
+        phrases,
         scorer=fuzz.token_sort_ratio,
+        score_cutoff=_FUZZY_WAKE_CUTOFF,
     )
+    if res is None:
+        return None, 0
+    cand, score, *_ = res
     return cand, score
 
 
+def hotword_detect(text: str):
+    return _wake_detect(text, HOTWORDS, _HOTWORD_KEYS)
+
+
 def endword_detect(text: str):
-    if not text.strip():
-        return None, 0
-    cand, score, *_ = fprocess.extractOne(
-        text.lower(),
-        SESSION_END_WORDS,
-        scorer=fuzz.token_sort_ratio,
-    )
-    return cand, score
+    return _wake_detect(text, SESSION_END_WORDS, _ENDWORD_KEYS)
 
 
 # --------- High-level command helpers ---------
@@ -419,26 +671,103 @@ def build_command(text: str) -> Dict[str, Any]:
     If cleaned_text yields unknown intent, fall back to running detect_intent on the original text.
     """
     text = (text or "").strip()
+    cached = _command_cache_get(text)
+    if cached is not None:
+        return cached
+
+    prep = _prepare_command(text)
+    if not prep:
+        return {}
+    needs_ner = _needs_ner(prep)
+    entities = extract_entities(prep["entity_source_text"]) if needs_ner else []
+    cmd = _finish_command(prep, entities)
+    if not needs_ner and prep["settled"]:
+        _command_cache_put(text, cmd)
+    return cmd
+
+
+# ---- Command memo (repeat utterances: "open chrome", "close tab", ...) ----
+# Keyed on the stripped subcommand text (case kept: file names depend on it).
+# Not stored: commands that went through NER (relative times like
+# "in 10 minutes" resolve against the clock) and commands built from a
+# Gemini error/breaker fallback. Callers mutate the dicts they get back
+# (module/ts stamps), so entries are copied in and out.
+_CMD_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_CMD_CACHE_MAX = 512
+_CMD_CACHE_LOCK = threading.Lock()
+
+
+def _command_cache_get(key: str) -> Dict[str, Any] | None:
+    with _CMD_CACHE_LOCK:
+        cmd = _CMD_CACHE.get(key)
+        if cmd is None:
+            return None
+        _CMD_CACHE.move_to_end(key)
+    return copy.deepcopy(cmd)
+
+
+def _command_cache_put(key: str, cmd: Dict[str, Any]) -> None:
+    cmd = copy.deepcopy(cmd)
+    with _CMD_CACHE_LOCK:
+        _CMD_CACHE[key] = cmd
+        _CMD_CACHE.move_to_end(key)
+        if len(_CMD_CACHE) > _CMD_CACHE_MAX:
+            _CMD_CACHE.popitem(last=False)
+
+
+def _clean_subcommands(parts: List[str]) -> List[str]:
+    """
+    enhance_transcript for every subcommand, submitted together to
+    gemini_helper's pool so N pieces cost ~one round-trip instead of N.
+    """
+    if not (GEMINI_AVAILABLE and hasattr(_gemini, "enhance_transcript_async")):
+        return list(parts)
+
+    futures = []
+    for p in parts:
+        try:
+            futures.append(_gemini.enhance_transcript_async(p))
+        except Exception:
+            futures.append(None)
+
+    cleaned: List[str] = []
+    for p, fut in zip(parts, futures):
+        try:
+            cleaned.append(fut.result() if fut is not None else p)
+        except Exception:
+            cleaned.append(p)
+    return cleaned
+
+
+def _prepare_command(text: str, cleaned: str | None = None) -> Dict[str, Any]:
+    """
+    Cleaning + intent for one subcommand; entities are filled in by _finish_command.
+    Pass `cleaned` when the transcript was already enhanced (see _clean_subcommands).
+    """
+    text = (text or "").strip()
     if not text:
         return {}
 
     # Prefer gemini to clean the transcript (aggressive mode)
-    cleaned = text
-    try:
-        if GEMINI_AVAILABLE and hasattr(_gemini, "enhance_transcript_sync"):
-            cleaned = _gemini.enhance_transcript_sync(text)
-        else:
-            cleaned = text
-    except Exception:
+    if cleaned is None:
         cleaned = text
+        try:
+            if GEMINI_AVAILABLE and hasattr(_gemini, "enhance_transcript_sync"):
+                cleaned = _gemini.enhance_transcript_sync(text)
+        except Exception:
+            cleaned = text
+    # Commands built from a Gemini fallback are kept out of the command memo
+    settled = _cleaning_settled(text)
 
     # 1) Try intent on cleaned text
-    intent_label, conf = detect_intent(cleaned)
+    intent_label, conf, ok = _detect_intent(cleaned)
+    settled = settled and ok
 
     # 2) If cleaned gives unknown, fallback to original (conservative)
     if intent_label == "unknown":
         try:
-            orig_label, orig_conf = detect_intent(text)
+            orig_label, orig_conf, ok = _detect_intent(text)
+            settled = settled and ok
             # if original has a real label, prefer it
             if orig_label and orig_label != "unknown":
                 intent_label, conf = orig_label, orig_conf
@@ -448,33 +777,41 @@ def build_command(text: str) -> Dict[str, Any]:
     # 3) Allow gemini intent refinement override if provided AND confident
     normalized_from_gemini = None
     try:
-        if GEMINI_AVAILABLE and hasattr(_gemini, "refine_intent_sync"):
-            try:
-                gi = _gemini.refine_intent_sync(cleaned)
-                if isinstance(gi, dict):
-                    gi_intent = gi.get("intent")
-                    gi_conf = float(gi.get("confidence", 0.0)) if gi.get("confidence") is not None else None
-                    gi_norm_text = gi.get("normalized_text")
-                    if gi_intent and gi_intent != "unknown" and (gi_conf and gi_conf > 0.1):
-                        # only accept gemini's intent if it claims >= 0.1 confidence
-                        intent_label = gi_intent
-                        conf = max(0.0, min(1.0, float(gi_conf or conf)))
-                    if gi_norm_text:
-                        normalized_from_gemini = gi_norm_text
-            except Exception:
-                pass
+        gi = _refine_intent_llm(cleaned)
+        if isinstance(gi, dict):
+            gi_intent = gi.get("intent")
+            gi_conf = float(gi.get("confidence", 0.0)) if gi.get("confidence") is not None else None
+            gi_norm_text = gi.get("normalized_text")
+            if gi_intent and gi_intent != "unknown" and (gi_conf and gi_conf > 0.1):
+                # only accept gemini's intent if it claims >= 0.1 confidence
+                intent_label = gi_intent
+                conf = max(0.0, min(1.0, float(gi_conf or conf)))
+            if gi_norm_text:
+                normalized_from_gemini = gi_norm_text
+    except _Unsettled:
+        settled = False
     except Exception:
         pass
 
     # Entities extracted from gemini-normalized text (if present) OR cleaned/original
-    entity_source_text = normalized_from_gemini or cleaned or text
-    entities = extract_entities(entity_source_text)
-    norm = normalize_entities(entities, entity_source_text)
-
     return {
         "original_text": text,
         "cleaned_text": cleaned,
-        "intent": {"label": intent_label, "confidence": round(conf, 3)},
+        "intent_label": intent_label,
+        "confidence": conf,
+        "entity_source_text": normalized_from_gemini or cleaned or text,
+        "settled": settled,
+    }
+
+
+def _finish_command(prep: Dict[str, Any], entities: List[Dict[str, str]]) -> Dict[str, Any]:
+    entity_source_text = prep["entity_source_text"]
+    norm = normalize_entities(entities, entity_source_text)
+
+    return {
+        "original_text": prep["original_text"],
+        "cleaned_text": prep["cleaned_text"],
+        "intent": {"label": prep["intent_label"], "confidence": round(prep["confidence"], 3)},
         "entities": entities,
         "normalized": norm,
         "tokens": (entity_source_text or "").split(),
@@ -485,7 +822,8 @@ def process_text_commands(utterance: str) -> List[Dict[str, Any]]:
     """
     Top-level NLU entry:
       - splits an utterance into subcommands (using 'and', 'then', commas)
-      - runs build_command() on each cleaned piece (cleaning happens inside build_command).
+      - runs build_command() on each piece, with the Gemini clean-up of all pieces
+        in flight at once and spaCy NER batched into one nlp.pipe call.
     """
     base = (utterance or "").strip()
     if not base:
@@ -495,11 +833,28 @@ def process_text_commands(utterance: str) -> List[Dict[str, Any]]:
     if not parts:
         parts = [base]
 
-    cmds: List[Dict[str, Any]] = []
-    for p in parts:
-        cmd = build_command(p)
-        if cmd:
-            cmds.append(cmd)
-
-    return cmds
+    # Repeated pieces come straight from the command memo
+    cmds: List[Dict[str, Any] | None] = [_command_cache_get(p) for p in parts]
+    todo = [i for i, cmd in enumerate(cmds) if cmd is None]
+
+    if todo:
+        cleaned = _clean_subcommands([parts[i] for i in todo])
+        preps = [_prepare_command(parts[i], c) for i, c in zip(todo, cleaned)]
+
+        # NER only for pieces that may carry a date/time (see _HAS_TIME_HINT)
+        entities: List[List[Dict[str, str]]] = [[] for _ in preps]
+        need = [j for j, prep in enumerate(preps) if prep and _needs_ner(prep)]
+        found = extract_entities_batch([preps[j]["entity_source_text"] for j in need])
+        for j, ents in zip(need, found):
+            entities[j] = ents
+
+        need_set = set(need)
+        for j, (i, prep) in enumerate(zip(todo, preps)):
+            if not prep:
+                continue
+            cmds[i] = _finish_command(prep, entities[j])
+            if j not in need_set and prep["settled"]:
+                _command_cache_put(parts[i], cmds[i])
+
+    return [cmd for cmd in cmds if cmd]
 
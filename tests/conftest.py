@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Modules live at the repo root (no package), so make them importable
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture
+def flaky_gemini(monkeypatch):
+    """Gemini 'enabled', failing on the first call and answering afterwards."""
+    import gemini_helper
+
+    calls = []
+
+    def fake_call(transcript, timeout):
+        calls.append(transcript)
+        if len(calls) == 1:
+            raise TimeoutError("gemini timed out")
+        return "open the browser"
+
+    monkeypatch.setattr(gemini_helper, "genai", object())
+    monkeypatch.setattr(gemini_helper, "GEMINI_ENABLED", True)
+    monkeypatch.setattr(gemini_helper, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(gemini_helper, "_safe_call_gemini_sync", fake_call)
+    monkeypatch.setattr(gemini_helper, "_CACHE", gemini_helper._TTLCache(ttl=300))
+    monkeypatch.setattr(gemini_helper, "_GEMINI_FAILURES", 0)
+    monkeypatch.setattr(gemini_helper, "_GEMINI_DISABLED_UNTIL", 0.0)
+    return calls
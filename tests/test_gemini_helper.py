@@ -0,0 +1,31 @@
+import gemini_helper
+
+
+def test_enhance_retries_after_failure(flaky_gemini):
+    text = "uh please launch the bowser thing now"
+    first = gemini_helper.enhance_transcript_sync(text)
+    assert first != "open the browser"
+    assert not gemini_helper.is_enhancement_settled(text)
+
+    # The fallback was not cached: the same text reaches Gemini again
+    second = gemini_helper.enhance_transcript_sync(text)
+    assert second == "open the browser"
+    assert gemini_helper.is_enhancement_settled(text)
+    assert len(flaky_gemini) == 2
+
+    # Settled answers come from the cache
+    assert gemini_helper.enhance_transcript_sync(text) == second
+    assert len(flaky_gemini) == 2
+
+
+def test_open_breaker_result_not_cached(flaky_gemini, monkeypatch):
+    text = "could you maybe launch the bowser"
+    monkeypatch.setattr(gemini_helper, "_gemini_available", lambda: False)
+    gemini_helper.enhance_transcript_sync(text)
+    assert not gemini_helper.is_enhancement_settled(text)
+    assert flaky_gemini == []
+
+    # Breaker closes again: the text is sent instead of served from cache
+    monkeypatch.setattr(gemini_helper, "_gemini_available", lambda: True)
+    gemini_helper.enhance_transcript_sync(text)
+    assert len(flaky_gemini) == 1
@@ -0,0 +1,65 @@
+import pytest
+
+import nlu
+from config import HOTWORD_THRESHOLD
+from nlu import endword_detect, hotword_detect
+
+
+def _fires(detect, text):
+    cand, score = detect(text)
+    return bool(cand) and score >= HOTWORD_THRESHOLD
+
+
+@pytest.mark.parametrize("text", ["hey agent", "Hey agent.", "computer!", "  hello   agent "])
+def test_hotword_whole_utterance(text):
+    assert _fires(hotword_detect, text)
+
+
+@pytest.mark.parametrize("text", ["bye agent", "Go to sleep.", "stop listening"])
+def test_endword_whole_utterance(text):
+    assert _fires(endword_detect, text)
+
+
+@pytest.mark.parametrize("text", ["my computer is slow", "open the computer settings app"])
+def test_hotword_embedded_in_sentence(text):
+    assert not _fires(hotword_detect, text)
+
+
+@pytest.mark.parametrize("text", ["don't let it go to sleep", "stop listening to music"])
+def test_endword_embedded_in_sentence(text):
+    assert not _fires(endword_detect, text)
+
+
+def test_build_command_retries_after_gemini_failure(flaky_gemini, monkeypatch):
+    monkeypatch.setattr(nlu, "GEMINI_AVAILABLE", True)
+    text = "uh kindly fire up the bowser for me"
+
+    first = nlu.build_command(text)
+    second = nlu.build_command(text)
+    assert first["cleaned_text"] != "open the browser"
+    assert second["cleaned_text"] == "open the browser"
+    assert second["intent"]["label"] == "app.open"
+
+
+def test_llm_intent_shared_between_detect_and_prepare(monkeypatch):
+    import gemini_helper
+
+    calls = []
+
+    def fake_refine(text):
+        calls.append(text)
+        return {"intent": "weather.get", "confidence": 0.9}
+
+    monkeypatch.setattr(gemini_helper, "refine_intent_sync", fake_refine, raising=False)
+    monkeypatch.setattr(nlu, "GEMINI_AVAILABLE", True)
+    nlu._refine_intent_llm.cache_clear()
+    nlu._detect_intent_memo.cache_clear()
+    try:
+        cmd = nlu.build_command("how warm is it outside today")
+    finally:
+        nlu._refine_intent_llm.cache_clear()
+        nlu._detect_intent_memo.cache_clear()
+
+    # detect_intent and _prepare_command's refinement step share one LLM call
+    assert cmd["intent"]["label"] == "weather.get"
+    assert calls == ["how warm is it outside today"]
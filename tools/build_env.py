@@ -0,0 +1,37 @@
+# tools/build_env.py
+#
+# Compile .env into _env_compiled.py so startup can import it (and reuse the
+# cached .pyc) instead of parsing .env every run. Re-run after editing .env;
+# bootstrap.load_env() falls back to dotenv while the compiled file is stale.
+
+from pathlib import Path
+
+from dotenv import dotenv_values
+
+ROOT = Path(__file__).resolve().parent.parent
+ENV_PATH = ROOT / ".env"
+OUT_PATH = ROOT / "_env_compiled.py"
+
+
+def main() -> None:
+    if not ENV_PATH.exists():
+        print(f"No .env found at {ENV_PATH}")
+        return
+
+    values = dotenv_values(ENV_PATH)
+    lines = [
+        "# Generated by tools/build_env.py from .env -- do not edit.",
+        "import os",
+        "",
+    ]
+    for key, val in values.items():
+        if val is None:
+            continue
+        lines.append(f"os.environ.setdefault({key!r}, {val!r})")
+
+    OUT_PATH.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    print(f"Wrote {len(lines) - 3} entries to {OUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 # utils.py
 
 import atexit
+import functools
 import json
+import queue
 import re
 import shutil
 import subprocess
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict
@@ -33,24 +37,100 @@ from googleapiclient.discovery import build
 
 try:
     import pyttsx3
+except Exception:
+    pyttsx3 = None
 
-    _tts_engine = pyttsx3.init()
-    _tts_engine.setProperty("rate", 180)
-    _tts_engine.setProperty("volume", 1.0)
+# Utterances waiting for the TTS worker; None is the shutdown sentinel.
+_TTS_Q: "queue.Queue[tuple[str, threading.Event | None] | None]" = queue.Queue()
+_tts_thread = None
+_tts_thread_lock = threading.Lock()
 
-    def speak(text: str) -> None:
-        """Text-to-speech (with console print)."""
-        try:
-            print(f"🗣️ {text}")
-            _tts_engine.say(text)
-            _tts_engine.runAndWait()
-        except Exception as e:
-            print(f"(tts) error: {e}")
 
-except Exception:
-    def speak(text: str) -> None:
-        """Fallback speak that only prints to console."""
-        print(f"🗣️ {text}")
+def _init_tts_engine():
+    engine = pyttsx3.init()
+    engine.setProperty("rate", 180)
+    engine.setProperty("volume", 1.0)
+    return engine
+
+
+def _tts_worker() -> None:
+    # The driver is created here because some backends (SAPI5, NSSpeech) are
+    # bound to the thread that initialised them.
+    try:
+        engine = _init_tts_engine()
+    except Exception as e:
+        print(f"(tts) init error: {e}")
+        engine = None
+
+    stop = False
+    while not stop:
+        item = _TTS_Q.get()
+        if item is None:
+            break
+        texts, waiters = [item[0]], [item[1]]
+
+        # Coalesce lines queued while the previous one was playing
+        while True:
+            try:
+                item = _TTS_Q.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            texts.append(item[0])
+            waiters.append(item[1])
+
+        if engine is not None:
+            try:
+                engine.say(" ".join(texts))
+                engine.runAndWait()
+            except Exception as e:
+                print(f"(tts) error: {e}")
+
+        for done in waiters:
+            if done is not None:
+                done.set()
+
+
+def _stop_tts_worker() -> None:
+    # Let queued speech finish (e.g. the shutdown message) before exiting
+    _TTS_Q.put(None)
+    if _tts_thread is not None:
+        _tts_thread.join(timeout=10.0)
+
+
+def _ensure_tts_worker() -> None:
+    global _tts_thread
+    if _tts_thread is not None:
+        return
+    with _tts_thread_lock:
+        if _tts_thread is None:
+            _tts_thread = threading.Thread(
+                target=_tts_worker, name="tts_worker", daemon=True
+            )
+            _tts_thread.start()
+            atexit.register(_stop_tts_worker)
+
+
+def speak(text: str) -> None:
+    """Text-to-speech (with console print). Returns immediately; audio plays on the TTS worker."""
+    print(f"🗣️ {text}")
+    if pyttsx3 is None:
+        return
+    _ensure_tts_worker()
+    _TTS_Q.put((text, None))
+
+
+def speak_sync(text: str, timeout: float = None) -> None:
+    """Like speak(), but blocks until the utterance has been played (or timeout)."""
+    print(f"🗣️ {text}")
+    if pyttsx3 is None:
+        return
+    _ensure_tts_worker()
+    done = threading.Event()
+    _TTS_Q.put((text, done))
+    done.wait(timeout)
 
 
 # -------------- Time helpers --------------
@@ -74,48 +154,158 @@ def make_aware(dt: datetime) -> datetime:
 
 # -------------- Logging (JSONL) --------------
 
+# orjson (C extension) for log serialization when installed
+try:
+    import orjson
+
+    def _json_line(obj: Dict[str, Any]) -> str:
+        # default=str handles ObjectId and other non-JSON types
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode() + "\n"
+
+except ImportError:
+    def _json_line(obj: Dict[str, Any]) -> str:
+        # NOTE: default=str handles ObjectId and other non-JSON types
+        return json.dumps(obj, ensure_ascii=False, default=str) + "\n"
+
+
 _buffer = []  # buffered NLU logs
+_log_lock = threading.Lock()  # guards _buffer and the handles below
+_log_files: Dict[Path, Any] = {}  # path -> append handle, opened on first use
+
+
+def _log_file(path: Path):
+    """Kept-open append handle for a log file (call with _log_lock held)."""
+    fh = _log_files.get(path)
+    if fh is None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fh = _log_files[path] = path.open("a", encoding="utf-8")
+    return fh
+
+
+def _write_lines(path: Path, records) -> None:
+    """Write records as JSON lines in one write + flush (call with _log_lock held)."""
+    fh = _log_file(path)
+    fh.write("".join(map(_json_line, records)))
+    fh.flush()
 
 
 def append_jsonl(record: Dict[str, Any]) -> None:
     """Append a record to the NLU JSONL log with small buffering."""
-    global _buffer
     if not record:
         return
-    _buffer.append(record)
-    if len(_buffer) >= 5:
-        with NLU_LOG.open("a", encoding="utf-8") as f:
-            for r in _buffer:
-                # NOTE: default=str handles ObjectId and other non-JSON types
-                f.write(json.dumps(r, ensure_ascii=False, default=str) + "\n")
-        _buffer.clear()
+    with _log_lock:
+        _buffer.append(record)
+        if len(_buffer) >= 5:
+            _write_lines(NLU_LOG, _buffer)
+            _buffer.clear()
 
 
 def flush_jsonl() -> None:
     """Flush remaining buffered NLU logs."""
-    global _buffer
-    if not _buffer:
-        return
-    with NLU_LOG.open("a", encoding="utf-8") as f:
-        for r in _buffer:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
-    _buffer = []
+    with _log_lock:
+        if not _buffer:
+            return
+        _write_lines(NLU_LOG, _buffer)
+        _buffer.clear()
 
 
-atexit.register(flush_jsonl)
+def _close_logs() -> None:
+    flush_jsonl()
+    with _log_lock:
+        for fh in _log_files.values():
+            try:
+                fh.close()
+            except Exception:
+                pass
+        _log_files.clear()
 
-def _insert_mongo(collection_name: str, doc: Dict[str, Any]) -> None:
-    """Insert a document into MongoDB (best-effort, non-fatal)."""
-    if not doc or not collection_name:
-        return
+
+atexit.register(_close_logs)
+
+# -------------- Mongo (background batched writes) --------------
+
+_MONGO_BATCH = 50  # max docs per insert_many
+_MONGO_FLUSH_SEC = 0.5  # max time a doc waits for its batch to fill
+
+_mongo_q: "queue.Queue[tuple[str, Dict[str, Any]]]" = queue.Queue()
+_mongo_stop = threading.Event()
+_mongo_thread = None
+_mongo_thread_lock = threading.Lock()
+
+
+def _drain_mongo_batch():
+    """Up to _MONGO_BATCH queued (collection, doc) pairs, waiting at most _MONGO_FLUSH_SEC."""
+    try:
+        items = [_mongo_q.get(timeout=_MONGO_FLUSH_SEC)]
+    except queue.Empty:
+        return []
+    deadline = time.monotonic() + _MONGO_FLUSH_SEC
+    while len(items) < _MONGO_BATCH:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            items.append(_mongo_q.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return items
+
+
+def _write_mongo_batch(items) -> None:
+    by_collection: Dict[str, list] = {}
+    for collection_name, doc in items:
+        by_collection.setdefault(collection_name, []).append(doc)
     try:
         db = get_db()
         if db is None:
             return
-        db[collection_name].insert_one(doc)
     except Exception as e:
-        # Don't crash the app if Mongo is down
-        print(f"(mongo) insert error into {collection_name}: {e}")
+        print(f"(mongo) insert error: {e}")
+        return
+    for collection_name, docs in by_collection.items():
+        try:
+            db[collection_name].insert_many(docs, ordered=False)
+        except Exception as e:
+            # Don't crash the app if Mongo is down
+            print(f"(mongo) insert error into {collection_name}: {e}")
+
+
+def _mongo_flusher() -> None:
+    # Keeps draining after stop is requested until the queue is empty
+    while not (_mongo_stop.is_set() and _mongo_q.empty()):
+        items = _drain_mongo_batch()
+        if items:
+            _write_mongo_batch(items)
+
+
+def _stop_mongo_flusher() -> None:
+    _mongo_stop.set()
+    if _mongo_thread is not None:
+        _mongo_thread.join(timeout=5.0)
+
+
+def _ensure_mongo_flusher() -> None:
+    global _mongo_thread
+    if _mongo_thread is not None:
+        return
+    with _mongo_thread_lock:
+        if _mongo_thread is None:
+            _mongo_thread = threading.Thread(
+                target=_mongo_flusher, name="mongo_flusher", daemon=True
+            )
+            _mongo_thread.start()
+            atexit.register(_stop_mongo_flusher)
+
+
+def _insert_mongo(collection_name: str, doc: Dict[str, Any]) -> None:
+    """Queue a document for MongoDB (best-effort, non-fatal, off the caller's thread)."""
+    if not doc or not collection_name:
+        return
+    _ensure_mongo_flusher()
+    # Shallow copy: insert_many adds "_id", and the caller's dict may still be
+    # serialized to the JSONL log on another thread.
+    _mongo_q.put((collection_name, dict(doc)))
+
 
 def log_agent(obj: Dict[str, Any]) -> None:
     """Log agent events to AGENT_LOG and MongoDB."""
@@ -123,9 +313,8 @@ def log_agent(obj: Dict[str, Any]) -> None:
         return
 
     # File log (existing behaviour)
-    AGENT_LOG.parent.mkdir(parents=True, exist_ok=True)
-    with AGENT_LOG.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+    with _log_lock:
+        _write_lines(AGENT_LOG, (obj,))
 
     # Mongo log (new)
     _insert_mongo(MONGO_COLLECTION_AGENT, obj)
@@ -134,14 +323,23 @@ def log_agent(obj: Dict[str, Any]) -> None:
 
 # -------------- Shell / system helpers --------------
 
+# $PATH lookups are memoized; call invalidate_which_cache() after installs
+_which_cached = functools.lru_cache(maxsize=128)(shutil.which)
+
+
+def invalidate_which_cache() -> None:
+    """Forget memoized which() results (e.g. after installing an app)."""
+    _which_cached.cache_clear()
+
+
 def which(programs):
     """Return first found executable from a list (or string)."""
     if isinstance(programs, (list, tuple)):
         for p in programs:
-            if shutil.which(p):
+            if _which_cached(p):
                 return p
         return None
-    return shutil.which(programs)
+    return _which_cached(programs)
 
 
 def open_with(programs, args=None, return_program: bool = False):
@@ -191,29 +389,29 @@ def run_cmd(cmd) -> str:
         return str(e)
 
 
+_HOME = Path.home()
+
+# Keyed by the keyword with trailing "s" stripped, so singular/plural (and
+# the "homes"/"musics" forms FileManagerAgent produces) share one entry.
+_DIR_MAP = {
+    "home": _HOME,
+    "download": _HOME / "Downloads",
+    "document": _HOME / "Documents",
+    "desktop": _HOME / "Desktop",
+    "picture": _HOME / "Pictures",
+    "music": _HOME / "Music",
+    "video": _HOME / "Videos",
+}
+
+
 def expand_dir_keyword(keyword: str) -> Path:
     """
     Map spoken folder keywords like 'downloads' or 'documents'
     to real paths under the user's home.
     """
-    home = Path.home()
-    mapping = {
-        "home": home,
-        "downloads": home / "Downloads",
-        "documents": home / "Documents",
-        "desktop": home / "Desktop",
-        "pictures": home / "Pictures",
-        "music": home / "Music",
-        "videos": home / "Videos",
-    }
     if not keyword:
-        return home
-    kraw = keyword.strip().lower()
-    k = kraw.rstrip("s") + ("s" if kraw.endswith("s") else "s")
-    for key, path in mapping.items():
-        if k.startswith(key.rstrip("s")):
-            return path
-    return home
+        return _HOME
+    return _DIR_MAP.get(keyword.strip().lower().rstrip("s"), _HOME)
 
 
 def looks_like_url(s: str) -> bool:
@@ -228,11 +426,52 @@ def looks_like_url(s: str) -> bool:
 
 # -------------- Gmail helper --------------
 
+# Credentials are loaded once per process. The service object is built per
+# thread: googleapiclient rides on httplib2, which is not thread-safe.
+_gmail_creds = None
+_gmail_generation = 0  # bumped by refresh_gmail_service() to drop per-thread services
+_gmail_lock = threading.Lock()
+_gmail_local = threading.local()
+
+
 def get_gmail_service():
     """
-    Returns an authenticated Gmail API service.
+    Returns an authenticated Gmail API service for the calling thread.
+    Credentials are shared; each thread builds its own service once.
     On first run, opens a browser window for OAuth consent and saves token.json.
     """
+    local = _gmail_local
+    service = getattr(local, "service", None)
+    if service is not None and local.generation == _gmail_generation:
+        return service
+
+    global _gmail_creds
+    with _gmail_lock:
+        if _gmail_creds is None:
+            # Failures are not cached, so the next call retries
+            _gmail_creds = _load_gmail_credentials()
+        creds, generation = _gmail_creds, _gmail_generation
+    if creds is None:
+        return None
+
+    try:
+        service = build("gmail", "v1", credentials=creds)
+    except Exception as e:
+        print(f"(gmail) Failed to build service: {e}")
+        return None
+    local.service, local.generation = service, generation
+    return service
+
+
+def refresh_gmail_service() -> None:
+    """Drop cached credentials and services (e.g. after a token refresh failure); the next call rebuilds them."""
+    global _gmail_creds, _gmail_generation
+    with _gmail_lock:
+        _gmail_creds = None
+        _gmail_generation += 1
+
+
+def _load_gmail_credentials():
     creds = None
     token_path = Path("token.json")
 
@@ -263,12 +502,7 @@ def get_gmail_service():
             with token_path.open("w", encoding="utf-8") as f:
                 f.write(creds.to_json())
 
-    try:
-        service = build("gmail", "v1", credentials=creds)
-        return service
-    except Exception as e:
-        print(f"(gmail) Failed to build service: {e}")
-        return None
+    return creds
         
         
 def log_nlu(record: Dict[str, Any]) -> None: